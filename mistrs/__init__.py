@@ -1,7 +1,60 @@
 # __init__.py
 __version__ = "0.1.8"
 
+import importlib
+
 from .auth import get_credentials, get_headers
-from .api import get, get_paginated, post, put, delete, debug_get, debug_put, debug_delete, debug_post
-from .data import create_xlsx, create_csv, read_xlsx, read_csv, list_ids, jprint, print_table, clean_mac, edittime, analyze_errors
-from .net import subnet
\ No newline at end of file
+from .api import MistClient, default_client, set_default_client, get, get_paginated, iter_pages, iter_paginated, post, put, delete, debug_get, debug_put, debug_delete, debug_post
+from .metrics import MetricsCollector, add_hook, remove_hook
+from .net import subnet
+
+# Loaded on first use so `import mistrs` stays fast for scripts that only call the API.
+# The data helpers pull in pandas, matplotlib and seaborn
+_LAZY = {
+    'create_xlsx': 'data',
+    'create_csv': 'data',
+    'stream_to_csv': 'data',
+    'iter_csv': 'data',
+    'read_xlsx': 'data',
+    'read_csv': 'data',
+    'list_ids': 'data',
+    'jprint': 'data',
+    'print_table': 'data',
+    'clean_mac': 'data',
+    'edittime': 'data',
+    'analyze_errors': 'data',
+    'site_fan_out': 'adv',
+    'get_sites': 'adv',
+    'get_inventory': 'adv',
+    'ping_hook': 'adv',
+    'Inventory': 'adv',
+    'bulk_write': 'bulk',
+    'search_events': 'search',
+    'run_orgs': 'orgs',
+    'upgrade_devices': 'upgrade',
+    'WebhookReceiver': 'webhook',
+    'resumable_paginated': 'checkpoint',
+    'clear_job': 'checkpoint',
+    'Snapshot': 'snapshot',
+    'Columnar': 'columnar',
+}
+
+# Names exported by `from mistrs import *`. Star imports load the lazy names as well
+__all__ = [
+    'get_credentials', 'get_headers',
+    'MistClient', 'default_client', 'set_default_client', 'get', 'get_paginated', 'iter_pages', 'iter_paginated',
+    'post', 'put', 'delete', 'debug_get', 'debug_put', 'debug_delete', 'debug_post',
+    'MetricsCollector', 'add_hook', 'remove_hook',
+    'subnet',
+    *_LAZY,
+]
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f'.{_LAZY[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
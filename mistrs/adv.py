@@ -1,15 +1,469 @@
-import requests, json
+import requests, json, time, threading
+from pathlib import Path
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
 from mistrs import get_paginated, get, post
+from .api import MistClient
+from .files import write_atomic
+from .serialize import loads
 
-#def get_sites(org_id, headers):
-    #create a dictionary of ids and sites
+_clients = {}
+_clients_lock = threading.Lock()
 
-#def get_inventory(org_id, headers, hwtype):
-    #get inventory based on hw type. returns an array
+def as_client(client, pool_size=10):
+    # Accept either a MistClient or a credentials dict from get_credentials(). Clients made
+    # from credentials are kept per api_url, token and pool size, so repeated calls reuse
+    # one session and its connections instead of opening a new pool every time
+    if isinstance(client, MistClient):
+        return client
+    key = (client.get('api_url'), client.get('api_token'), pool_size)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = MistClient(client, pool_size=pool_size)
+        return _clients[key]
 
-#def upgrade_site():
+def site_fan_out(client, org_id, path_template, workers=8, paginated=False, sites=None, show_progress=True):
+    """
+    Run the same site level GET for every site in an org on a bounded worker pool.
 
-#def upgrade_ap(org_id, headers, mac, version):
+    Sites are listed once, then path_template is formatted for each site and fetched
+    concurrently through one client, so all workers share its connection pool and
+    the rate limiter. A failing site is recorded in errors instead of stopping the run.
 
-#def ping_hook():
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        org_id (str): Org to enumerate sites from
+        path_template (str): URL or path relative to api_url with {site_id}, {org_id}
+            and/or {site_name} placeholders, e.g. "sites/{site_id}/stats/devices"
+        workers (int): Number of sites queried at the same time (default: 8)
+        paginated (bool): Fetch every page of each site's result (default: False)
+        sites (list): Site dicts to use instead of listing the org's sites (optional)
+        show_progress (bool): Whether to show a progress bar (default: True)
+
+    Returns:
+        tuple: (results, errors) dicts keyed by site id. results hold each site's
+            response, errors the reason a site failed
+
+    Example:
+        results, errors = site_fan_out(credentials, org_id, "sites/{site_id}/wlans/derived")
+    """
+    client = as_client(client, pool_size=workers)
+    if sites is None:
+        sites = list(get_sites(client, org_id))
+
+    def fetch(site):
+        url = path_template.format(site_id=site['id'], org_id=org_id, site_name=site.get('name', ''))
+        if paginated:
+            return list(client.iter_paginated(url))
+        response = client.request("GET", url)
+        if response.status_code != 200:
+            raise Exception(f"HTTP Error {response.status_code}: {response.text[:200]}")
+        return loads(response.content)
+
+    results = {}
+    errors = {}
+    pbar = tqdm(total=len(sites), desc="Querying sites") if show_progress else None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch, site): site['id'] for site in sites}
+        for future in as_completed(futures):
+            site_id = futures[future]
+            try:
+                results[site_id] = future.result()
+            except Exception as e:
+                errors[site_id] = str(e)
+            if pbar is not None:
+                pbar.update(1)
+    if pbar is not None:
+        pbar.close()
+
+    if errors:
+        print(f"{len(errors)} of {len(sites)} sites failed")
+    return results, errors
+
+# Seconds a saved site directory is trusted before the API is asked for changes
+SITES_MAX_AGE = 600
+
+# Sites requested per page, most orgs fit in one
+SITES_PAGE = 1000
+
+class SiteDirectory:
+    """
+    Site id to name (and timezone and sitegroups) lookups for an org. Iterating yields
+    site dicts with id, name, timezone and sitegroup_ids, so it can be passed wherever a
+    list of sites is expected, e.g. analyze_errors(site_array=...). Use get_sites to load one.
+
+    Example:
+        sites = get_sites(credentials, org_id)
+        print(sites.name(device['site_id']))
+    """
+    FIELDS = ('id', 'name', 'timezone', 'sitegroup_ids')
+
+    def __init__(self, sites=()):
+        self._sites = {}
+        self._ids = {}
+        for site in sites:
+            site = {field: site.get(field) for field in self.FIELDS}
+            self._sites[site['id']] = site
+            self._ids.setdefault(site['name'], site['id'])
+
+    def name(self, site_id, default=None):
+        # Name of a site, default if the id is unknown
+        site = self._sites.get(site_id)
+        return site['name'] if site else default
+
+    def id(self, name, default=None):
+        # Id of the site with this name, default if there is none
+        return self._ids.get(name, default)
+
+    def timezone(self, site_id, default=None):
+        site = self._sites.get(site_id)
+        return site['timezone'] if site else default
+
+    def sitegroups(self, site_id):
+        site = self._sites.get(site_id)
+        return list(site['sitegroup_ids'] or []) if site else []
+
+    def in_sitegroup(self, sitegroup_id):
+        # Sites that belong to a sitegroup
+        return [site for site in self._sites.values() if sitegroup_id in (site['sitegroup_ids'] or [])]
+
+    def names(self):
+        # {site_id: name} for every site
+        return {site_id: site['name'] for site_id, site in self._sites.items()}
+
+    def __getitem__(self, site_id):
+        return self._sites[site_id]
+
+    def __contains__(self, site_id):
+        return site_id in self._sites
+
+    def __iter__(self):
+        return iter(self._sites.values())
+
+    def __len__(self):
+        return len(self._sites)
+
+    def __repr__(self):
+        return f"SiteDirectory({len(self)} sites)"
+
+def _save_json(file, data):
+    # Write a JSON file atomically
+    file.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(file, json.dumps(data))
+
+def get_sites(client, org_id, max_age=SITES_MAX_AGE, refresh=False, config_dir=None):
+    """
+    Site directory of an org, kept in ~/.mistrs/sites between runs.
+
+    A saved directory younger than max_age is used without any request. After that the
+    first page of sites is requested with the saved ETag / Last-Modified, and the saved
+    copy is kept if the API answers 304 Not Modified. Otherwise the sites are downloaded
+    again, which for orgs with up to 1000 sites is that same single request. Larger orgs
+    are always downloaded again, as the validators only cover the first page.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        org_id (str): Org to list sites of
+        max_age (int): Seconds the saved directory is trusted without asking the API (default: 600)
+        refresh (bool): Ignore max_age and check for changes now (default: False)
+        config_dir (str): Directory for the saved directories (default: ~/.mistrs)
+
+    Returns:
+        SiteDirectory
+
+    Example:
+        sites = get_sites(credentials, org_id)
+        analyze_errors(events, site_array=sites)
+    """
+    client = as_client(client)
+    file = (Path(config_dir) if config_dir else Path.home() / ".mistrs") / "sites" / f"{org_id}.json"
+    saved = None
+    if file.exists():
+        try:
+            saved = json.loads(file.read_text())
+        except ValueError:
+            saved = None
+        if not isinstance(saved, dict) or 'checked' not in saved or 'sites' not in saved:
+            saved = None
+    if saved is not None and not refresh and time.time() - saved['checked'] < max_age:
+        return SiteDirectory(saved['sites'])
+
+    url = f"orgs/{org_id}/sites?limit={SITES_PAGE}"
+    headers = {}
+    # A 304 for the first page says nothing about later pages, so larger orgs are not checked
+    if saved is not None and len(saved['sites']) < SITES_PAGE:
+        if saved.get('etag'):
+            headers['If-None-Match'] = saved['etag']
+        if saved.get('last_modified'):
+            headers['If-Modified-Since'] = saved['last_modified']
+    response = client.request("GET", url, headers=headers or None)
+
+    if response.status_code == 304 and saved is not None:
+        saved['checked'] = time.time()
+    elif response.status_code == 200:
+        sites = loads(response.content)
+        total = response.headers.get('X-Page-Total')
+        if len(sites) >= SITES_PAGE and (total is None or int(total) > len(sites)):
+            # More than one page, fetch them all
+            sites = list(client.iter_paginated(f"orgs/{org_id}/sites", limit=SITES_PAGE))
+        saved = {
+            'org_id': org_id,
+            'checked': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sites': [{field: site.get(field) for field in SiteDirectory.FIELDS} for site in sites]
+        }
+    elif saved is not None:
+        # Keep working from the saved copy if the API is unavailable
+        print(f"Site check failed with HTTP {response.status_code}, using saved sites")
+        return SiteDirectory(saved['sites'])
+    else:
+        raise Exception(f"HTTP Error {response.status_code}: {response.text[:200]}")
+
+    _save_json(file, saved)
+    return SiteDirectory(saved['sites'])
+
+# Characters stripped from MACs, matching clean_mac
+_MAC_TABLE = str.maketrans('', '', '.:-')
+
+def normalize_macs(macs):
+    # clean_mac for many MACs at once, without a function call per MAC
+    return [mac.translate(_MAC_TABLE).lower() if mac else mac for mac in macs]
+
+class Inventory:
+    """
+    Org inventory with hash indexes, so looking up a device by MAC, serial, name, model or
+    site is a dict lookup instead of a scan of the device list.
+
+    MACs are stored and looked up in clean_mac form, so "5C:5B:35:00:00:01",
+    "5c5b.3500.0001" and "5c5b35000001" all find the same device. Use get_inventory to
+    load one from the API.
+
+    Args:
+        devices (list): Inventory dicts as returned by orgs/{org_id}/inventory
+
+    Example:
+        inventory = get_inventory(credentials, org_id)
+        ap = inventory.by_mac("5c:5b:35:00:00:01")
+        site_aps = inventory.of_type('ap').by_site(site_id)
+    """
+    INDEXES = ('serial', 'name', 'model', 'site_id', 'type')
+
+    def __init__(self, devices=()):
+        self._devices = {}
+        self._index = {field: {} for field in self.INDEXES}
+        self._source = None
+        self.update(devices)
+
+    def _key(self, device):
+        return device.get('mac') or device.get('serial') or device.get('id')
+
+    def _add(self, key, device):
+        self._devices[key] = device
+        for field, index in self._index.items():
+            value = device.get(field)
+            if value is not None:
+                index.setdefault(value, {})[key] = device
+
+    def _remove(self, key):
+        device = self._devices.pop(key)
+        for field, index in self._index.items():
+            value = device.get(field)
+            if value is not None and value in index:
+                index[value].pop(key, None)
+                if not index[value]:
+                    del index[value]
+
+    def _prepare(self, devices):
+        # (key, device) pairs with the MACs normalized in one pass
+        devices = list(devices)
+        macs = normalize_macs([device.get('mac') for device in devices])
+        prepared = []
+        for device, mac in zip(devices, macs):
+            if mac:
+                device = dict(device, mac=mac)
+            key = self._key(device)
+            if key is not None:
+                prepared.append((key, device))
+        return prepared
+
+    def update(self, devices):
+        """
+        Add or replace devices, leaving the others untouched.
+
+        Returns:
+            dict: Number of devices 'added' and 'changed'
+        """
+        return self._apply(self._prepare(devices))
+
+    def _apply(self, prepared):
+        added = changed = 0
+        for key, device in prepared:
+            existing = self._devices.get(key)
+            if existing == device:
+                continue
+            if existing is None:
+                added += 1
+            else:
+                changed += 1
+                self._remove(key)
+            self._add(key, device)
+        return {'added': added, 'changed': changed}
+
+    def refresh(self, client=None):
+        """
+        Fetch the inventory again and apply only the differences, so indexes of unchanged
+        devices are not rebuilt. Only works on an Inventory loaded by get_inventory.
+
+        Args:
+            client (MistClient or dict): Client to use instead of the one it was loaded with (optional)
+
+        Returns:
+            dict: Number of devices 'added', 'changed' and 'removed'
+        """
+        if self._source is None:
+            raise ValueError("Inventory was not loaded by get_inventory, nothing to refresh from")
+        loaded_client, url = self._source
+        client = as_client(client) if client is not None else loaded_client
+        prepared = self._prepare(client.iter_paginated(url, limit=1000))
+        counts = self._apply(prepared)
+        current = {key for key, _ in prepared}
+        removed = [key for key in self._devices if key not in current]
+        for key in removed:
+            self._remove(key)
+        counts['removed'] = len(removed)
+        return counts
+
+    def by_mac(self, mac):
+        # Device with this MAC in any common notation, None if not in the inventory
+        return self._devices.get(mac.translate(_MAC_TABLE).lower()) if mac else None
+
+    def _first(self, field, value):
+        matches = self._index[field].get(value)
+        return next(iter(matches.values())) if matches else None
+
+    def by_serial(self, serial):
+        # Device with this serial number, None if not in the inventory
+        return self._first('serial', serial)
+
+    def by_name(self, name):
+        # Device with this name, None if not in the inventory
+        return self._first('name', name)
+
+    def by_model(self, model):
+        # All devices of a model, e.g. 'AP45'
+        return list(self._index['model'].get(model, {}).values())
+
+    def by_site(self, site_id):
+        # All devices assigned to a site
+        return list(self._index['site_id'].get(site_id, {}).values())
+
+    def find(self, **criteria):
+        """
+        Devices matching every given field, e.g. find(model='AP45', site_id=site_id).
+        Indexed fields are intersected starting from the smallest match, other fields
+        are compared on the remaining devices.
+        """
+        if 'mac' in criteria:
+            device = self.by_mac(criteria.pop('mac'))
+            candidates = {self._key(device): device} if device else {}
+        else:
+            indexed = [self._index[field].get(criteria.pop(field), {}) for field in list(criteria) if field in self._index]
+            candidates = min(indexed, key=len) if indexed else self._devices
+            for matches in indexed:
+                if matches is not candidates:
+                    candidates = {key: device for key, device in candidates.items() if key in matches}
+        return [device for device in candidates.values()
+                if all(device.get(field) == value for field, value in criteria.items())]
+
+    def of_type(self, hwtype):
+        # New Inventory holding only devices of one type ('ap', 'switch' or 'gateway').
+        # It is a snapshot, refresh the full inventory and call of_type again for updates
+        view = Inventory()
+        for key, device in self._index['type'].get(hwtype, {}).items():
+            view._add(key, device)
+        return view
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __iter__(self):
+        return iter(self._devices.values())
+
+    def __contains__(self, mac):
+        return self.by_mac(mac) is not None
+
+    def __repr__(self):
+        return f"Inventory({len(self)} devices)"
+
+def get_inventory(client, org_id, hwtype=None):
+    """
+    Load an org's inventory into an indexed Inventory.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        org_id (str): Org to load the inventory of
+        hwtype (str): Only load one device type, 'ap', 'switch' or 'gateway' (default: all)
+
+    Returns:
+        Inventory
+
+    Example:
+        inventory = get_inventory(credentials, org_id)
+        for row in read_csv("aps.csv"):
+            device = inventory.by_mac(row['mac'])
+    """
+    client = as_client(client)
+    url = f"orgs/{org_id}/inventory" + (f"?type={hwtype}" if hwtype else "")
+    inventory = Inventory(client.iter_paginated(url, limit=1000))
+    inventory._source = (client, url)
+    return inventory
+
+def upgrade_ap(client, site_id, device_id, version, reboot=True):
+    """
+    Start the upgrade of a single device.
+
+    Returns:
+        tuple: (success, response body) as returned by post
+    """
+    client = as_client(client)
+    return client.post({"version": version, "reboot": reboot}, f"sites/{site_id}/devices/{device_id}/upgrade")
+
+def upgrade_site(client, site_id, version, device_type='ap', **kwargs):
+    """
+    Upgrade every device of one type at a site to a firmware version, in waves.
+    Takes the options of upgrade_devices, e.g. canary=0.1 to start with a tenth of the APs.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        site_id (str): Site to upgrade
+        version (str): Firmware version to upgrade to
+        device_type (str): 'ap', 'switch', 'gateway' or 'all' (default: 'ap')
+
+    Returns:
+        UpgradeReport
+    """
+    from .upgrade import upgrade_devices
+    client = as_client(client)
+    devices = list(client.iter_paginated(f"sites/{site_id}/stats/devices?type={device_type}"))
+    kwargs.setdefault('by', 'model')
+    return upgrade_devices(client, devices, version, **kwargs)
+
+def ping_hook(client, org_id, webhook_id, site_id=None):
+    """
+    Ask Mist to send a ping event to a webhook, to check a receiver (see mistrs.webhook)
+    is reachable and verifies the secret.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        org_id (str): Org the webhook belongs to
+        webhook_id (str): Webhook to ping
+        site_id (str): Site of a site level webhook (optional)
+
+    Returns:
+        tuple: (success, response body) as returned by post
+    """
+    client = as_client(client)
+    scope = f"sites/{site_id}" if site_id else f"orgs/{org_id}"
+    return client.post({}, f"{scope}/webhooks/{webhook_id}/ping")
@@ -0,0 +1,390 @@
+import asyncio, math, urllib.parse, weakref
+from tqdm import tqdm
+from .auth import get_headers
+from .api import _page_url, _next_url, _warn_incomplete
+from .ratelimit import get_limiter
+from .retry import RetryPolicy, NO_RETRY
+from .serialize import loads, dumpb, load_page, parse_fields
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class AsyncMistClient:
+    """
+    asyncio client for the MIST API, the awaitable counterpart of MistClient.
+
+    All requests share one aiohttp session and are bounded by a semaphore, so
+    thousands of calls can be gathered on a single event loop without opening
+    thousands of connections.
+
+    Args:
+        credentials (dict): Output of get_credentials(). Used for the default
+            Authorization header and to resolve relative URLs (optional)
+        concurrency (int): Maximum number of requests in flight (default: 10)
+        timeout (float): Total request timeout in seconds, None to wait forever (default: None)
+        rate_limit (bool): Pace requests with the shared per host/token rate limiter (default: True)
+        retry (RetryPolicy): When to re-send failed requests, False to never retry (default: RetryPolicy())
+
+    Example:
+        async with AsyncMistClient(credentials, concurrency=20) as client:
+            stats = await asyncio.gather(*[client.get(f"sites/{site_id}/stats") for site_id in site_ids])
+    """
+    def __init__(self, credentials=None, concurrency=10, timeout=None, rate_limit=True, retry=None):
+        if aiohttp is None:
+            raise ImportError("mistrs.aio requires aiohttp. Install it with: pip install aiohttp")
+        self.credentials = credentials or {}
+        self.api_url = self.credentials.get('api_url')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.retry = NO_RETRY if retry is False else retry or RetryPolicy()
+        self.headers = {}
+        if self.credentials.get('api_token'):
+            self.headers.update(get_headers(self.credentials['api_token']))
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        # Close the underlying aiohttp session and its connections
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def url(self, path):
+        # Resolve a path relative to the client's api_url. Full URLs are returned unchanged
+        if path.startswith('http://') or path.startswith('https://') or not self.api_url:
+            return path
+        return f"{self.api_url.rstrip('/')}/{path.lstrip('/')}"
+
+    def session(self):
+        # aiohttp sessions must be created inside a running loop, so this is done on first use
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def request(self, method, url, headers=None, retry=None, **kwargs):
+        """
+        Send a request and read the whole body. Requests wait for the rate limiter
+        and are re-sent according to the retry policy.
+
+        Returns:
+            tuple: (status code, response headers, body bytes)
+        """
+        session = self.session()
+        url = self.url(url)
+        policy = self.retry if retry is None else NO_RETRY if retry is False else retry
+        limiter = None
+        if self.rate_limit:
+            limiter = get_limiter(url, (headers or {}).get('Authorization') or self.headers.get('Authorization'))
+        attempt = 0
+        while True:
+            attempt += 1
+            if limiter is not None:
+                await asyncio.sleep(limiter.reserve())
+            try:
+                async with self._semaphore:
+                    async with session.request(method, url, headers=headers, **kwargs) as resp:
+                        status, resp_headers, body = resp.status, resp.headers, await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not policy.should_retry(method, attempt, error=e):
+                    raise
+                await asyncio.sleep(policy.delay(attempt))
+                continue
+            if limiter is not None:
+                limiter.update(status, resp_headers)
+            if not policy.should_retry(method, attempt, status=status):
+                return status, resp_headers, body
+            # The limiter already waits out Retry-After on a 429
+            if status != 429 or limiter is None:
+                await asyncio.sleep(policy.delay(attempt, resp_headers))
+
+    async def get(self, url, headers=None):
+        # GET data from mist. return will be an array of the response
+        try:
+            status, _, body = await self.request("GET", url, headers=headers)
+            if status >= 400:
+                raise Exception(f"HTTP Error {status}: {body.decode(errors='replace')}")
+            return loads(body)
+        except Exception as e:
+            print(f"Error in API request: {e}")
+            return None
+
+    async def post(self, data, url, headers=None, retry=None):
+        #POST data to mist. input requires (data, url). retry=True also retries a POST on errors
+        retry = RetryPolicy(retry_post=True) if retry is True else retry
+        try:
+            status, _, body = await self.request("POST", url, headers=headers, retry=retry, data=dumpb(data))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Request failed: {str(e)}")
+            return False, str(e)
+        return _write_result(status, body)
+
+    async def put(self, data, url, headers=None):
+        #PUT data to mist. input requires (data, url)
+        try:
+            status, _, body = await self.request("PUT", url, headers=headers, data=dumpb(data))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Request failed: {str(e)}")
+            return False, str(e)
+        return _write_result(status, body)
+
+    async def delete(self, url, headers=None):
+        # DELETE data from mist. URL requires full endpoint to remove
+        try:
+            status, _, body = await self.request("DELETE", url, headers=headers)
+            text = body.decode(errors='replace')
+            if status == 200:
+                return True, text
+            print(f"Failed - HTTP Error {status}: {text}")
+            return False, text
+        except aiohttp.ClientError as e:
+            return False, print(f"Request failed: {str(e)}")
+
+    async def _get_pages(self, url, pages, headers=None, paths=None):
+        # Fetch page numbers concurrently, returning (status, headers, data) in page order
+        async def fetch(page):
+            status, resp_headers, body = await self.request("GET", _page_url(url, page), headers=headers)
+            return status, resp_headers, load_page(body, paths) if status == 200 else body
+        return await asyncio.gather(*[fetch(page) for page in pages])
+
+    async def get_paginated(self, initial_url, headers=None, limit=100, show_progress=True, debug=False, fields=None):
+        """
+        Get all paginated results from the MIST API, see MistClient.get_paginated.
+
+        When the total is known (X-Page-Total or 'total') the remaining pages are
+        requested concurrently, bounded by the client's concurrency. A page that still
+        fails after its retries is requested once more on its own before the result is
+        given up as incomplete. Cursor ('next') responses are followed in order.
+
+        Args:
+            initial_url (str): The initial URL to query
+            headers (dict): Headers to include in the request (default: the client's headers)
+            limit (int): Number of items per page (default: 100)
+            show_progress (bool): Whether to show a progress bar (default: True)
+            debug (bool): Whether to print debug information (default: False)
+            fields (list): Keep only these fields of each item, dotted for nested keys (optional)
+
+        Returns:
+            list: All items from the paginated API
+        """
+        paths = parse_fields(fields)
+
+        def debug_print(message):
+            if debug:
+                print(f"DEBUG: {message}")
+
+        initial_url = self.url(initial_url)
+        parsed_url = urllib.parse.urlparse(initial_url)
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+        # Add limit parameter to URL if not already present
+        if '?' in initial_url:
+            if 'limit=' not in initial_url:
+                initial_url += f'&limit={limit}'
+        else:
+            initial_url += f'?limit={limit}'
+        debug_print(f"Initial URL: {initial_url}")
+
+        status, resp_headers, body = await self.request("GET", initial_url, headers=headers)
+        debug_print(f"Response status code: {status}")
+        if status != 200:
+            raise Exception(f"API request failed with status code {status}: {body.decode(errors='replace')}")
+        data = load_page(body, paths)
+        total_items = _header_int(resp_headers, "X-Page-Total")
+        pbar = None
+
+        async def refetch(page, status, body):
+            # A page that still failed in the concurrent fetch gets one more go on its own,
+            # as MistClient hands it to its serial loop
+            debug_print(f"Page {page} failed with {status}: {body.decode(errors='replace')}, fetching it again")
+            status, _, body = await self.request("GET", _page_url(initial_url, page), headers=headers)
+            return status, load_page(body, paths) if status == 200 else body
+
+        if isinstance(data, dict) and 'results' in data:
+            pagination_type = 'results'
+            all_items = list(data['results'])
+            if total_items is None:
+                total_items = data.get('total')
+            if show_progress:
+                pbar = tqdm(total=total_items, desc="Fetching data")
+                pbar.update(len(all_items))
+
+            next_url = _next_url(base_url, data)
+            if next_url:
+                # Cursor pagination can only be walked in order
+                while next_url:
+                    debug_print(f"Using next URL: {next_url}")
+                    status, _, body = await self.request("GET", next_url, headers=headers)
+                    if status != 200:
+                        debug_print(f"Response text: {body.decode(errors='replace')}")
+                        _warn_incomplete(next_url, _http_error(status, body), len(all_items), total_items)
+                        break
+                    data = load_page(body, paths)
+                    if not isinstance(data, dict) or not data.get('results'):
+                        break
+                    all_items.extend(data['results'])
+                    if pbar is not None:
+                        pbar.update(len(data['results']))
+                    next_url = _next_url(base_url, data)
+            elif total_items is not None:
+                page_limit = data.get('limit') or limit
+                pages = range(2, math.ceil(total_items / page_limit) + 1)
+                debug_print(f"Fetching {len(pages)} pages concurrently")
+                fetched = await self._get_pages(initial_url, pages, headers, paths)
+                for page, (status, _, page_data) in zip(pages, fetched):
+                    if status != 200:
+                        status, page_data = await refetch(page, status, page_data)
+                    if status != 200:
+                        _warn_incomplete(_page_url(initial_url, page), _http_error(status, page_data), len(all_items),
+                                         total_items)
+                        break
+                    if not isinstance(page_data, dict) or not page_data.get('results'):
+                        break
+                    all_items.extend(page_data['results'])
+                    if pbar is not None:
+                        pbar.update(len(page_data['results']))
+            else:
+                page = 1
+                while True:
+                    page += 1
+                    status, _, body = await self.request("GET", _page_url(initial_url, page), headers=headers)
+                    if status != 200:
+                        _warn_incomplete(_page_url(initial_url, page), _http_error(status, body), len(all_items),
+                                         total_items)
+                        break
+                    data = load_page(body, paths)
+                    if not isinstance(data, dict) or not data.get('results'):
+                        break
+                    all_items.extend(data['results'])
+                    if pbar is not None:
+                        pbar.update(len(data['results']))
+
+        elif isinstance(data, list):
+            pagination_type = 'list'
+            all_items = list(data)
+            current_page = _header_int(resp_headers, "X-Page-Page") or 1
+            page_limit = _header_int(resp_headers, "X-Page-Limit") or limit
+            if show_progress:
+                pbar = tqdm(total=total_items, desc="Fetching pages (list endpoint)")
+                pbar.update(len(data))
+
+            if len(data) == page_limit and total_items is not None:
+                pages = range(current_page + 1, math.ceil(total_items / page_limit) + 1)
+                debug_print(f"Fetching {len(pages)} pages concurrently")
+                fetched = await self._get_pages(initial_url, pages, headers, paths)
+                for page, (status, _, page_data) in zip(pages, fetched):
+                    if status != 200:
+                        status, page_data = await refetch(page, status, page_data)
+                    if status != 200:
+                        _warn_incomplete(_page_url(initial_url, page), _http_error(status, page_data), len(all_items),
+                                         total_items)
+                        break
+                    if not isinstance(page_data, list):
+                        break
+                    all_items.extend(page_data)
+                    if pbar is not None:
+                        pbar.update(len(page_data))
+            else:
+                while len(data) == page_limit:
+                    current_page += 1
+                    status, _, body = await self.request("GET", _page_url(initial_url, current_page), headers=headers)
+                    if status != 200:
+                        _warn_incomplete(_page_url(initial_url, current_page), _http_error(status, body), len(all_items),
+                                         total_items)
+                        break
+                    data = load_page(body, paths)
+                    if not isinstance(data, list):
+                        break
+                    all_items.extend(data)
+                    if pbar is not None:
+                        pbar.update(len(data))
+
+        else:
+            # Unknown pagination type or no pagination
+            pagination_type = 'unknown'
+            all_items = data
+
+        if pbar is not None:
+            pbar.close()
+
+        print(f"Pagination type detected: {pagination_type}")
+        print(f"Total items retrieved: {len(all_items) if isinstance(all_items, list) else 'N/A (not a list)'}")
+
+        return all_items
+
+def _http_error(status, body):
+    # Short reason for a failed page
+    return f"HTTP {status}: {body.decode(errors='replace')[:200]}"
+
+def _header_int(headers, name):
+    # Read an integer pagination header, None if missing or invalid
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def _write_result(status, body):
+    # Shape POST/PUT results the same way as mistrs.api: (success, parsed body)
+    try:
+        text = loads(body) if body.strip() else None
+    except ValueError:
+        text = body.decode(errors='replace')
+    if status == 200:
+        print ('Done')
+        return True, text
+    print("Failed - HTTP Error {}".format(status))
+    return False, text
+
+_default_clients = weakref.WeakKeyDictionary()
+
+def default_client():
+    # Shared client for the running event loop, created on first use
+    loop = asyncio.get_running_loop()
+    client = _default_clients.get(loop)
+    if client is None:
+        client = _default_clients[loop] = AsyncMistClient()
+    return client
+
+async def close_default_client():
+    # Close the running loop's shared client. Call before the loop ends to avoid unclosed session warnings
+    client = _default_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+async def get(url, headers):
+    # GET data from mist. input requires (url, headers). return will be an array of the response
+    return await default_client().get(url, headers)
+
+async def post(data, url, headers, retry=None):
+    #POST data to mist. input requires (data, url, headers). retry=True also retries on errors
+    return await default_client().post(data, url, headers, retry=retry)
+
+async def put(data, url, headers):
+    #PUT data to mist. input requires (data, url, headers)
+    return await default_client().put(data, url, headers)
+
+async def delete(url, headers):
+    # DELETE data from mist. URL requires full endpoint to remove. Input requires (url, headers)
+    return await default_client().delete(url, headers)
+
+async def get_paginated(initial_url, headers, limit=100, show_progress=True, debug=False, fields=None):
+    """
+    Get all paginated results from the MIST API using the loop's shared client.
+    See AsyncMistClient.get_paginated for details.
+
+    Returns:
+        list: All items from the paginated API
+    """
+    return await default_client().get_paginated(initial_url, headers, limit=limit, show_progress=show_progress, debug=debug,
+                                                fields=fields)
@@ -1,5 +1,13 @@
-import requests, json, time, urllib.parse, re,sys
+import requests, json, time, urllib.parse, re,sys, threading, math, collections, itertools, contextlib
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from .auth import get_headers, invalidate_validation
+from .ratelimit import get_limiter
+from .retry import RetryPolicy, NO_RETRY
+from .metrics import _hooks, _emit, timed_pages
+from .serialize import loads, dumpb, load_page, parse_fields
+from .columnar import Columnar
 
 def debug_get(url, headers):
     """Safely execute GET request with error handling"""
@@ -11,10 +19,9 @@ def debug_get(url, headers):
 
 def debug_put(data, url, headers):
     """Safely execute PUT request with detailed error handling"""
-    import requests
     try:
-        # Use requests directly for better error visibility
-        response = requests.put(url, json=data, headers=headers)
+        # Use the raw response for better error visibility
+        response = default_client().request("PUT", url, headers=headers, data=dumpb(data))
         
         print(f"\nDEBUG - HTTP Status Code: {response.status_code}")
         print(f"DEBUG - Response Headers: {dict(response.headers)}")
@@ -22,7 +29,7 @@ def debug_put(data, url, headers):
         
         if response.status_code == 200:
             try:
-                return response.json()
+                return loads(response.content)
             except json.JSONDecodeError:
                 # Success but no JSON body (sometimes APIs return empty on success)
                 if not response.text.strip():
@@ -39,10 +46,9 @@ def debug_put(data, url, headers):
 
 def debug_post(data, url, headers):
     """Safely execute POST request with detailed error handling"""
-    import requests
     try:
-        # Use requests directly for better error visibility
-        response = requests.post(url, json=data, headers=headers)
+        # Use the raw response for better error visibility
+        response = default_client().request("POST", url, headers=headers, data=dumpb(data))
         
         print(f"\nDEBUG - HTTP Status Code: {response.status_code}")
         print(f"DEBUG - Response Headers: {dict(response.headers)}")
@@ -50,7 +56,7 @@ def debug_post(data, url, headers):
         
         if response.status_code == 200:
             try:
-                return response.json()
+                return loads(response.content)
             except json.JSONDecodeError:
                 # Success but no JSON body (sometimes APIs return empty on success)
                 if not response.text.strip():
@@ -67,10 +73,9 @@ def debug_post(data, url, headers):
 
 def debug_delete(url, headers):
     """Safely execute DELETE request with detailed error handling"""
-    import requests
     try:
-        # Use requests directly for better error visibility
-        response = requests.delete(url, headers=headers)
+        # Use the raw response for better error visibility
+        response = default_client().request("DELETE", url, headers=headers)
         
         print(f"\nDEBUG - HTTP Status Code: {response.status_code}")
         print(f"DEBUG - Response Headers: {dict(response.headers)}")
@@ -78,7 +83,7 @@ def debug_delete(url, headers):
         
         if response.status_code == 200:
             try:
-                return response.json()
+                return loads(response.content)
             except json.JSONDecodeError:
                 # Success but no JSON body (sometimes APIs return empty on success)
                 if not response.text.strip():
@@ -93,332 +98,776 @@ def debug_delete(url, headers):
         print(f"Request failed: {str(e)}")
         return None
 
-def post(data, url, headers):
-#POST data to mist. input requires (data, url, headers)
-    payload = json.dumps(data)
-    send = requests.request("POST", url, data=payload, headers=headers)
-    text = json.loads(send.text)
-    if send.status_code == 200:
-        response = True
-        print ('Done')
-    else:
-        print("Failed - HTTP Error {}".format(send.status_code))
-        response = False
-    return response, text
- 
-def put(data, url, headers):
-#PUT data to mist. input requires (data, url, headers)
-    payload = json.dumps(data)
-    send = requests.request("PUT", url, data=payload, headers=headers)
-    text = json.loads(send.text)
-    if send.status_code == 200:
-        response = True
-        print ('Done')
-    else:
-        print("Failed - HTTP Error {}".format(send.status_code))
-        response = False
-    return response, text
-
-def delete(url, headers):
-    # DELETE data from mist. URL requires full endpoint to remove. Input requires (url, headers)
-    try:
-        response = requests.request("DELETE", url, headers=headers)
-        if response.status_code == 200:
-            return True, response.text
-        else:
-            print(f"Failed - HTTP Error {response.status_code}: {response.text}")
-            return False, response.text
-    except requests.exceptions.RequestException as e:
-        return False, print(f"Request failed: {str(e)}")
-
-def get(url, headers):
-    # GET data from mist. input requires (url, headers). return will be an array of the response
-    try:
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()  # Check for HTTP errors
-        data = json.loads(resp.text)
-        return data
-    except Exception as e:
-        print(f"Error in API request: {e}")
-        return None
-
-def get_paginated(initial_url, headers, limit=100, show_progress=True, debug=False):
+class MistClient:
     """
-    Get all paginated results from the MIST API, supporting both:
-    1. Dict responses with 'results' field (standard pagination)
-    2. List responses that support page parameter (like /stats/devices)
+    Pooled, keep-alive client for the MIST API.
 
-    Uses HTTP headers (X-Page-Total, X-Page-Page, X-Page-Limit) for progress tracking when available.
+    Every request goes through one requests.Session so TCP/TLS connections are
+    reused between calls instead of being re-negotiated each time.
 
     Args:
-        initial_url (str): The initial URL to query
-        headers (dict): Headers to include in the request
-        limit (int): Number of items per page (default: 100)
-        show_progress (bool): Whether to show a progress bar (default: True)
-        debug (bool): Whether to print debug information (default: False)
-
-    Returns:
-        list: All items from the paginated API
+        credentials (dict): Output of get_credentials(). Used for the default
+            Authorization header and to resolve relative URLs (optional)
+        pool_size (int): Maximum number of pooled connections per host (default: 10)
+        keep_alive (bool): Keep connections open between requests (default: True)
+        timeout (float): Request timeout in seconds, None to wait forever (default: None)
+        rate_limit (bool): Pace requests with the shared per host/token rate limiter,
+            see mistrs.ratelimit (default: True)
+        retry (RetryPolicy): When to re-send failed requests, False to never retry
+            (default: RetryPolicy(), idempotent methods and 429s only)
+        cache (BaseCache): Response cache for get and get_paginated, e.g. LRUCache() or
+            SQLiteCache() from mistrs.cache. Writes invalidate the touched path (default: None)
+        validators (ValidatorStore): Remember ETag/Last-Modified per URL and send repeated GETs
+            as conditional requests, a 304 is answered from the stored body (default: None)
+        session (requests.Session): Session to send requests through instead of a new one, so
+            several clients (e.g. one per org token) share its connection pool. pool_size and
+            keep_alive are then left to the session's owner (optional)
+        budget (RateLimiter): Extra limiter every request also waits for, to cap several
+            clients together, e.g. all orgs on one API host (optional)
+
+    Example:
+        client = MistClient(get_credentials())
+        sites = client.get(f"orgs/{org_id}/sites")
     """
-    def debug_print(message):
-        if debug:
-            print(f"DEBUG: {message}")
-
-    # Extract base URL (scheme + netloc) for handling relative URLs
-    parsed_url = urllib.parse.urlparse(initial_url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-    debug_print(f"Base URL: {base_url}")
-
-    # Add limit parameter to URL if not already present
-    if '?' in initial_url:
-        if 'limit=' not in initial_url:
-            initial_url += f'&limit={limit}'
-    else:
-        initial_url += f'?limit={limit}'
-
-    debug_print(f"Initial URL: {initial_url}")
-
-    all_items = []
-    current_url = initial_url
-    pbar = None
-    total_items = None
-    pagination_type = None
+    def __init__(self, credentials=None, pool_size=10, keep_alive=True, timeout=None, rate_limit=True, retry=None, cache=None, validators=None,
+                 session=None, budget=None):
+        self.credentials = credentials or {}
+        self.api_url = self.credentials.get('api_url')
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.retry = NO_RETRY if retry is False else retry or RetryPolicy()
+        self.cache = cache
+        self.validators = validators
+        self.budget = budget
+        # Sent with every request rather than set on the session, which may be shared
+        self.headers = get_headers(self.credentials['api_token']) if self.credentials.get('api_token') else {}
+        self._owns_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if not keep_alive:
+                session.headers['Connection'] = 'close'
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Release all pooled connections, unless the session belongs to someone else
+        if self._owns_session:
+            self.session.close()
+
+    def url(self, path):
+        # Resolve a path relative to the client's api_url. Full URLs are returned unchanged
+        if path.startswith('http://') or path.startswith('https://') or not self.api_url:
+            return path
+        return f"{self.api_url.rstrip('/')}/{path.lstrip('/')}"
+
+    def token(self, headers=None):
+        # Authorization header a request will be sent with
+        return (headers or {}).get('Authorization') or self.headers.get('Authorization')
+
+    def limiter(self, url, headers=None):
+        # Shared rate limiter for the URL's host and the token used, None if rate limiting is off
+        if not self.rate_limit:
+            return None
+        return get_limiter(url, self.token(headers))
+
+    def invalidate(self, url):
+        # Drop cached responses for a resource, its children and its parent collection
+        if self.cache is not None:
+            self.cache.invalidate(self.url(url))
+        if self.validators is not None:
+            self.validators.invalidate(self.url(url))
+
+    def request(self, method, url, headers=None, retry=None, **kwargs):
+        # Send a request through the pooled session and return the raw response.
+        # Requests wait for the rate limiter and are re-sent according to the retry policy
+        url = self.url(url)
+        kwargs.setdefault('timeout', self.timeout)
+        if self.validators is None or method.upper() != 'GET':
+            return self._send(method, url, headers, retry, **kwargs)
+
+        # Conditional GET, a 304 is turned back into a 200 carrying the stored body
+        token = self.token(headers)
+        entry = self.validators.get(url, token)
+        if entry is not None:
+            headers = {**(headers or {}), **self.validators.conditional_headers(entry)}
+        response = self._send(method, url, headers, retry, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.validators.not_modified += 1
+            return _stored_response(response, entry)
+        if response.status_code == 200:
+            self.validators.set(url, response.headers, response.content, token)
+        return response
+
+    def _send(self, method, url, headers=None, retry=None, **kwargs):
+        # Rate limited, retried request. response.attempts holds the number of tries it took
+        policy = self.retry if retry is None else NO_RETRY if retry is False else retry
+        limiter = self.limiter(url, headers)
+        headers = {**self.headers, **headers} if headers else self.headers
+        pre_hooks, post_hooks = _hooks['pre_request'], _hooks['post_request']
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.budget is not None:
+                self.budget.acquire()
+            if limiter is not None:
+                limiter.acquire()
+            if pre_hooks:
+                headers = dict(headers)
+                _emit(pre_hooks, method, url, headers, attempt)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except Exception as e:
+                if post_hooks:
+                    _emit(post_hooks, method, url, None, e, time.perf_counter() - started, attempt)
+                if (not isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                        or not policy.should_retry(method, attempt, error=e)):
+                    raise
+                time.sleep(policy.delay(attempt))
+                continue
+            if post_hooks:
+                _emit(post_hooks, method, url, response, None, time.perf_counter() - started, attempt)
+            if limiter is not None:
+                limiter.update(response.status_code, response.headers)
+            if response.status_code == 401 and self.token(headers):
+                # The token is no longer valid, make get_credentials check it again. A
+                # failure to update the index must not replace the 401 response
+                try:
+                    invalidate_validation(self.token(headers))
+                except OSError as e:
+                    print(f"Warning: could not update the token index: {e}")
+            if not policy.should_retry(method, attempt, status=response.status_code):
+                response.attempts = attempt
+                return response
+            # The limiter already waits out Retry-After on a 429
+            if response.status_code != 429 or limiter is None:
+                time.sleep(policy.delay(attempt, response.headers))
+
+    def get(self, url, headers=None):
+        # GET data from mist. return will be an array of the response
+        url = self.url(url)
+        if self.cache is not None:
+            cached = self.cache.get(url, self.token(headers))
+            if cached is not None:
+                return loads(cached)
+        try:
+            resp = self.request("GET", url, headers=headers)
+            resp.raise_for_status()  # Check for HTTP errors
+            data = loads(resp.content)
+            if self.cache is not None:
+                self.cache.set(url, resp.content, self.token(headers))
+            return data
+        except Exception as e:
+            print(f"Error in API request: {e}")
+            return None
 
-    # Make initial request
-    debug_print(f"Making initial request to {current_url}")
-    response = requests.get(current_url, headers=headers)
+    def post(self, data, url, headers=None, retry=None):
+        #POST data to mist. input requires (data, url). retry=True also retries a POST on errors
+        payload = dumpb(data)
+        try:
+            send = self.request("POST", url, headers=headers, data=payload, retry=RetryPolicy(retry_post=True) if retry is True else retry)
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {str(e)}")
+            return False, str(e)
+        finally:
+            self.invalidate(url)
+        text = _parse_body(send)
+        if send.status_code == 200:
+            response = True
+            print ('Done')
+        else:
+            print("Failed - HTTP Error {}".format(send.status_code))
+            response = False
+        return response, text
 
-    debug_print(f"Response status code: {response.status_code}")
-    if response.status_code != 200:
-        debug_print(f"Response text: {response.text}")
-        raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
+    def put(self, data, url, headers=None):
+        #PUT data to mist. input requires (data, url)
+        payload = dumpb(data)
+        try:
+            send = self.request("PUT", url, headers=headers, data=payload)
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {str(e)}")
+            return False, str(e)
+        finally:
+            self.invalidate(url)
+        text = _parse_body(send)
+        if send.status_code == 200:
+            response = True
+            print ('Done')
+        else:
+            print("Failed - HTTP Error {}".format(send.status_code))
+            response = False
+        return response, text
 
-    # Try to get total from headers
-    header_total = response.headers.get("X-Page-Total")
-    if header_total is not None:
+    def delete(self, url, headers=None):
+        # DELETE data from mist. URL requires full endpoint to remove
+        self.invalidate(url)
         try:
-            total_items = int(header_total)
-            debug_print(f"Total items from header: {total_items}")
-        except (ValueError, TypeError):
-            debug_print(f"Could not parse X-Page-Total header: {header_total}")
-
-    data = response.json()
-
-    # Determine response type and pagination strategy
-    if isinstance(data, dict) and 'results' in data:
-        # This is standard pagination with results field
-        pagination_type = 'results'
-        debug_print(f"Detected standard pagination with 'results' field")
-        debug_print(f"Response keys: {list(data.keys())}")
-
-        # Initialize all_items with first page results
-        all_items = data['results'].copy()  # Use copy() to avoid reference issues
-        debug_print(f"Added {len(data['results'])} items from first page")
-
-        # Get total if available from response or use header total
-        if total_items is None:
-            total_items = data.get('total', None)
-            if total_items is not None:
-                debug_print(f"Total expected from response: {total_items}")
-
-        # Setup progress bar if requested
-        if show_progress:
-            if total_items is not None:
-                pbar = tqdm(total=total_items, desc="Fetching data")
-            else:
-                pbar = tqdm(desc="Fetching data")
-            pbar.update(len(data['results']))
-
-        # Check if we have a 'next' field for pagination
-        next_path = data.get('next')
-        next_url = None
-        if next_path:
-            # Handle relative URLs by prepending the base URL
-            if next_path.startswith('/'):
-                next_url = f"{base_url}{next_path}"
+            response = self.request("DELETE", url, headers=headers)
+            if response.status_code == 200:
+                return True, response.text
             else:
-                next_url = next_path
-            debug_print(f"Next URL (from response): {next_url}")
+                print(f"Failed - HTTP Error {response.status_code}: {response.text}")
+                return False, response.text
+        except requests.exceptions.RequestException as e:
+            return False, print(f"Request failed: {str(e)}")
+
+    def _fetch_pages(self, url, pages, headers=None, workers=4):
+        # Fetch page numbers concurrently on a bounded pool, yielding (page, response) in page order.
+        # At most workers * 2 pages are requested ahead of the caller so memory stays bounded
+        pages = iter(pages)
+        pending = collections.deque()
+        pool = ThreadPoolExecutor(max_workers=workers)
+        def submit(count):
+            for page in itertools.islice(pages, count):
+                pending.append((page, pool.submit(self.request, "GET", _page_url(url, page), headers=headers)))
+        try:
+            submit(workers * 2)
+            while pending:
+                page, future = pending.popleft()
+                response = future.result()
+                submit(1)
+                yield page, response
+        finally:
+            # Stop queued pages if the caller gives up early
+            for _, future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+    def _walk_pages(self, initial_url, headers=None, limit=100, debug=False, workers=None, info=None, offset=0,
+                    fields=None):
+        """
+        Generator behind get_paginated, iter_pages and iter_paginated. Yields the items
+        of each page in order as soon as the page arrives.
+
+        Args:
+            info (dict): Filled with 'type' ('results', 'list' or 'unknown') and 'total'
+                once the first response has been read, 'url' of the page being yielded, and
+                'error' ({'url', 'reason', 'items', 'total'}) if a page failed and the walk
+                stopped before the end (optional)
+            offset (int): Items already fetched before initial_url's page, when resuming
+                a crawl part way through (default: 0)
+            fields (list): Keep only these fields of each item, see serialize.parse_fields (optional)
+        """
+        pages = self._pages(initial_url, headers, limit, debug, workers, {} if info is None else info, offset,
+                            parse_fields(fields))
+        if _hooks['page']:
+            return timed_pages(pages, self.url(initial_url))
+        return pages
+
+    def _pages(self, initial_url, headers, limit, debug, workers, info, offset, paths):
+        # Pagination logic of _walk_pages
+
+        def debug_print(message):
+            if debug:
+                print(f"DEBUG: {message}")
+
+        def stopped(url, reason):
+            # A page still failing after the retries ends the walk with what was fetched so far
+            info['error'] = _warn_incomplete(url, reason, item_count, total_items)
+
+        initial_url = self.url(initial_url)
+
+        # Extract base URL (scheme + netloc) for handling relative URLs
+        parsed_url = urllib.parse.urlparse(initial_url)
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        debug_print(f"Base URL: {base_url}")
+
+        # Add limit parameter to URL if not already present
+        if '?' in initial_url:
+            if 'limit=' not in initial_url:
+                initial_url += f'&limit={limit}'
+        else:
+            initial_url += f'?limit={limit}'
 
-        # If no 'next' field but we have 'total', use page-based pagination
-        page = 1
+        debug_print(f"Initial URL: {initial_url}")
 
-        # Continue fetching pages until we have all items or no more pages
-        while True:
-            if next_url:
-                # Use the 'next' URL provided by the API
-                debug_print(f"Using next URL: {next_url}")
-                current_url = next_url
-            else:
-                # If no 'next' URL but we know there are more items, construct page URL
-                if total_items is not None and len(all_items) >= total_items:
-                    debug_print(f"Reached total items ({len(all_items)} of {total_items})")
-                    break
+        current_url = initial_url
+        total_items = None
 
-                page += 1
-                debug_print(f"Constructing URL for page {page}")
+        # Make initial request
+        debug_print(f"Making initial request to {current_url}")
+        response = self.request("GET", current_url, headers=headers)
 
-                # Construct URL with page parameter
-                if 'page=' in current_url:
-                    current_url = re.sub(r'page=\d+', f'page={page}', current_url)
-                else:
-                    if '?' in current_url:
-                        current_url = f"{current_url}&page={page}"
-                    else:
-                        current_url = f"{current_url}?page={page}"
-
-            debug_print(f"Next request URL: {current_url}")
-
-            # Make request for next page
-            response = requests.get(current_url, headers=headers)
-            debug_print(f"Response status code: {response.status_code}")
-
-            if response.status_code != 200:
-                debug_print(f"Response text: {response.text}")
-                if pbar is not None:
-                    pbar.close()
-                # Don't raise exception, just stop paginating
-                break
+        debug_print(f"Response status code: {response.status_code}")
+        if response.status_code != 200:
+            debug_print(f"Response text: {response.text}")
+            raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
 
-            data = response.json()
+        # Try to get total from headers
+        header_total = response.headers.get("X-Page-Total")
+        if header_total is not None:
+            try:
+                total_items = int(header_total)
+                debug_print(f"Total items from header: {total_items}")
+            except (ValueError, TypeError):
+                debug_print(f"Could not parse X-Page-Total header: {header_total}")
 
-            # Check if we got a valid response with results
-            if isinstance(data, dict) and 'results' in data:
-                page_items = data['results']
-                debug_print(f"Page has {len(page_items)} items")
+        data = load_page(response.content, paths)
 
-                if not page_items:  # Empty results, we're done
-                    debug_print("Empty results, stopping pagination")
-                    break
+        # Determine response type and pagination strategy
+        if isinstance(data, dict) and 'results' in data:
+            # This is standard pagination with results field
+            info['type'] = 'results'
+            debug_print(f"Detected standard pagination with 'results' field")
+            debug_print(f"Response keys: {list(data.keys())}")
 
-                all_items.extend(page_items)
-                if pbar is not None:
-                    pbar.update(len(page_items))
-
-                # Update next_url for next iteration
-                next_path = data.get('next')
-                next_url = None
-                if next_path:
-                    # Handle relative URLs by prepending the base URL
-                    if next_path.startswith('/'):
-                        next_url = f"{base_url}{next_path}"
-                    else:
-                        next_url = next_path
-                    debug_print(f"Next URL from response: {next_url}")
-                else:
-                    debug_print("No next URL in response")
+            # Get total if available from response or use header total
+            if total_items is None:
+                total_items = data.get('total', None)
+                if total_items is not None:
+                    debug_print(f"Total expected from response: {total_items}")
+            info['total'] = total_items
 
-                debug_print(f"Total items so far: {len(all_items)}")
-            else:
-                debug_print(f"No 'results' key in response, stopping pagination")
-                break
+            item_count = offset + len(data['results'])
+            debug_print(f"Added {len(data['results'])} items from first page")
+            info['url'] = current_url
+            yield data['results']
 
-            # Avoid rate limiting
-            time.sleep(0.1)
+            # Check if we have a 'next' field for pagination
+            next_url = _next_url(base_url, data)
+            debug_print(f"Next URL (from response): {next_url}")
 
-    elif isinstance(data, list):
-        # This is a list response that might support page-based pagination
-        pagination_type = 'list'
-        debug_print(f"Detected list response with {len(data)} items")
-        all_items = data.copy()  # Use copy() to avoid reference issues
+            # If no 'next' field but we have 'total', use page-based pagination
+            page = _url_page(current_url)
+
+            # Fan out the remaining pages when the total is known up front
+            if workers and workers > 1 and not next_url and total_items is not None:
+                page_limit = data.get('limit') or limit
+                pages = range(page + 1, math.ceil(total_items / page_limit) + 1)
+                debug_print(f"Fetching {len(pages)} pages with {workers} workers")
+                with contextlib.closing(self._fetch_pages(current_url, pages, headers, workers)) as fetched:
+                    for page_number, response in fetched:
+                        if response.status_code != 200:
+                            debug_print(f"Page {page_number} failed with {response.status_code}: {response.text}")
+                            break
+                        page_data = load_page(response.content, paths)
+                        if not isinstance(page_data, dict) or not page_data.get('results'):
+                            break
+                        page = page_number
+                        item_count += len(page_data['results'])
+                        info['url'] = _page_url(current_url, page)
+                        yield page_data['results']
+                # Anything left (e.g. after a failed page) is picked up by the serial loop below
+
+            # Continue fetching pages until we have all items or no more pages
+            while True:
+                if next_url:
+                    # Use the 'next' URL provided by the API
+                    debug_print(f"Using next URL: {next_url}")
+                    current_url = next_url
+                else:
+                    # If no 'next' URL but we know there are more items, construct page URL
+                    if total_items is not None and item_count >= total_items:
+                        debug_print(f"Reached total items ({item_count} of {total_items})")
+                        break
 
-        # Get pagination info from headers
-        page_header = response.headers.get("X-Page-Page")
-        limit_header = response.headers.get("X-Page-Limit")
+                    page += 1
+                    debug_print(f"Constructing URL for page {page}")
 
-        current_page = 1
-        if page_header:
-            try:
-                current_page = int(page_header)
-                debug_print(f"Current page from header: {current_page}")
-            except (ValueError, TypeError):
-                debug_print(f"Could not parse X-Page-Page header: {page_header}")
+                    # Construct URL with page parameter
+                    current_url = _page_url(current_url, page)
 
-        page_limit = limit
-        if limit_header:
-            try:
-                page_limit = int(limit_header)
-                debug_print(f"Page limit from header: {page_limit}")
-            except (ValueError, TypeError):
-                debug_print(f"Could not parse X-Page-Limit header: {limit_header}")
+                debug_print(f"Next request URL: {current_url}")
 
-        # Setup progress bar if requested
-        if show_progress:
-            if total_items is not None:
-                pbar = tqdm(total=total_items, desc="Fetching pages (list endpoint)")
-                pbar.update(len(data))
-            else:
-                pbar = tqdm(desc="Fetching pages (list endpoint)")
-                pbar.update(len(data))
+                # Make request for next page
+                response = self.request("GET", current_url, headers=headers)
+                debug_print(f"Response status code: {response.status_code}")
 
-        # Continue fetching pages until we get an empty list or fewer items than limit
-        while len(data) == page_limit:
-            current_page += 1
-            debug_print(f"Fetching page {current_page} for list response")
+                if response.status_code != 200:
+                    debug_print(f"Response text: {response.text}")
+                    # Don't raise exception, stop paginating and warn that the result is incomplete
+                    stopped(current_url, f"HTTP {response.status_code}: {response.text[:200]}")
+                    break
 
-            # Construct URL with page parameter
-            if 'page=' in current_url:
-                next_url = re.sub(r'page=\d+', f'page={current_page}', current_url)
-            else:
-                if '?' in current_url:
-                    next_url = f"{current_url}&page={current_page}"
-                else:
-                    next_url = f"{current_url}?page={current_page}"
+                data = load_page(response.content, paths)
 
-            debug_print(f"Next URL: {next_url}")
+                # Check if we got a valid response with results
+                if isinstance(data, dict) and 'results' in data:
+                    page_items = data['results']
+                    debug_print(f"Page has {len(page_items)} items")
 
-            # Make request for next page
-            response = requests.get(next_url, headers=headers)
-            debug_print(f"Response status code: {response.status_code}")
+                    if not page_items:  # Empty results, we're done
+                        debug_print("Empty results, stopping pagination")
+                        break
 
-            if response.status_code != 200:
-                debug_print(f"Response text: {response.text}")
-                if pbar is not None:
-                    pbar.close()
-                break  # Don't raise exception, just stop paginating
+                    item_count += len(page_items)
+                    info['url'] = current_url
+                    yield page_items
 
-            # Check headers again for updated pagination info
+                    # Update next_url for next iteration
+                    next_url = _next_url(base_url, data)
+                    debug_print(f"Next URL from response: {next_url}")
+                    debug_print(f"Total items so far: {item_count}")
+                else:
+                    debug_print(f"No 'results' key in response, stopping pagination")
+                    stopped(current_url, "response has no 'results'")
+                    break
+
+        elif isinstance(data, list):
+            # This is a list response that might support page-based pagination
+            info['type'] = 'list'
+            info['total'] = total_items
+            debug_print(f"Detected list response with {len(data)} items")
+            item_count = offset + len(data)
+            info['url'] = current_url
+            yield data
+
+            # Get pagination info from headers
             page_header = response.headers.get("X-Page-Page")
+            limit_header = response.headers.get("X-Page-Limit")
+
+            current_page = _url_page(current_url)
             if page_header:
                 try:
                     current_page = int(page_header)
                     debug_print(f"Current page from header: {current_page}")
                 except (ValueError, TypeError):
-                    pass
+                    debug_print(f"Could not parse X-Page-Page header: {page_header}")
+
+            page_limit = limit
+            if limit_header:
+                try:
+                    page_limit = int(limit_header)
+                    debug_print(f"Page limit from header: {page_limit}")
+                except (ValueError, TypeError):
+                    debug_print(f"Could not parse X-Page-Limit header: {limit_header}")
+
+            # Fan out the remaining pages when the total is known up front
+            if workers and workers > 1 and total_items is not None and len(data) == page_limit:
+                pages = range(current_page + 1, math.ceil(total_items / page_limit) + 1)
+                debug_print(f"Fetching {len(pages)} pages with {workers} workers")
+                with contextlib.closing(self._fetch_pages(current_url, pages, headers, workers)) as fetched:
+                    for page_number, response in fetched:
+                        if response.status_code != 200:
+                            debug_print(f"Page {page_number} failed with {response.status_code}: {response.text}")
+                            break
+                        page_data = load_page(response.content, paths)
+                        if not isinstance(page_data, list):
+                            break
+                        current_page, data = page_number, page_data
+                        item_count += len(data)
+                        info['url'] = _page_url(current_url, current_page)
+                        yield data
+                # Anything left (e.g. after a failed page) is picked up by the serial loop below
+
+            # Continue fetching pages until we get an empty list, fewer items than limit or the total
+            while len(data) == page_limit and (total_items is None or item_count < total_items):
+                current_page += 1
+                debug_print(f"Fetching page {current_page} for list response")
 
-            data = response.json()
+                # Construct URL with page parameter
+                next_url = _page_url(current_url, current_page)
 
-            if not isinstance(data, list):
-                debug_print(f"Response is not a list, stopping pagination")
-                break
+                debug_print(f"Next URL: {next_url}")
 
-            debug_print(f"Page {current_page} has {len(data)} items")
-            all_items.extend(data)
+                # Make request for next page
+                response = self.request("GET", next_url, headers=headers)
+                debug_print(f"Response status code: {response.status_code}")
 
-            if pbar is not None:
-                pbar.update(len(data))
+                if response.status_code != 200:
+                    debug_print(f"Response text: {response.text}")
+                    # Don't raise exception, stop paginating and warn that the result is incomplete
+                    stopped(next_url, f"HTTP {response.status_code}: {response.text[:200]}")
+                    break
+
+                # Check headers again for updated pagination info
+                page_header = response.headers.get("X-Page-Page")
+                if page_header:
+                    try:
+                        current_page = int(page_header)
+                        debug_print(f"Current page from header: {current_page}")
+                    except (ValueError, TypeError):
+                        pass
+
+                data = load_page(response.content, paths)
+
+                if not isinstance(data, list):
+                    debug_print(f"Response is not a list, stopping pagination")
+                    stopped(next_url, "response is not a list")
+                    break
+
+                debug_print(f"Page {current_page} has {len(data)} items")
+                item_count += len(data)
+                info['url'] = next_url
+                yield data
+
+                # Check if we've reached the total
+                if total_items is not None and item_count >= total_items:
+                    debug_print(f"Reached total items ({item_count} of {total_items})")
+                    break
+
+        else:
+            # Unknown pagination type or no pagination
+            info['type'] = 'unknown'
+            info['total'] = None
+            info['url'] = current_url
+            debug_print(f"Unknown pagination type or no pagination")
+            debug_print(f"Response type: {type(data)}")
+            if isinstance(data, dict):
+                debug_print(f"Response keys: {list(data.keys())}")
+            yield data
+
+    def iter_pages(self, initial_url, headers=None, limit=100, debug=False, workers=None, fields=None):
+        """
+        Yield each page of a paginated MIST API endpoint as soon as it arrives.
+
+        Uses the same pagination rules as get_paginated. Only the current page is held
+        in memory, and stopping the loop early means no further pages are requested.
+        A response that is not paginated is yielded once, unchanged.
+
+        Args:
+            initial_url (str): The initial URL to query
+            headers (dict): Headers to include in the request (default: the client's headers)
+            limit (int): Number of items per page (default: 100)
+            debug (bool): Whether to print debug information (default: False)
+            workers (int): Prefetch pages concurrently with this many threads (default: None, serial)
+            fields (list): Keep only these fields of each item, see get_paginated (optional)
+
+        Yields:
+            list: The items of one page
+        """
+        return self._walk_pages(initial_url, headers, limit=limit, debug=debug, workers=workers, fields=fields)
+
+    def iter_paginated(self, initial_url, headers=None, limit=100, debug=False, workers=None, fields=None):
+        """
+        Yield the items of a paginated MIST API endpoint one at a time, see iter_pages.
+
+        Example:
+            for event in client.iter_paginated(f"orgs/{org_id}/devices/events/search?duration=7d"):
+                if event['type'] == 'AP_DISCONNECTED':
+                    break
 
-            # Check if we've reached the total
-            if total_items is not None and len(all_items) >= total_items:
-                debug_print(f"Reached total items ({len(all_items)} of {total_items})")
+        Yields:
+            dict: One item from the paginated API
+        """
+        for page_items in self._walk_pages(initial_url, headers, limit=limit, debug=debug, workers=workers,
+                                           fields=fields):
+            if isinstance(page_items, list):
+                yield from page_items
+            else:
+                yield page_items
+
+    def get_paginated(self, initial_url, headers=None, limit=100, show_progress=True, debug=False, workers=None, job_id=None,
+                      fields=None, columnar=False):
+        """
+        Get all paginated results from the MIST API, supporting both:
+        1. Dict responses with 'results' field (standard pagination)
+        2. List responses that support page parameter (like /stats/devices)
+
+        Uses HTTP headers (X-Page-Total, X-Page-Page, X-Page-Limit) for progress tracking when available.
+        A page that still fails once the retries give up ends the fetch with a warning naming
+        the page, the error and the items retrieved so far, and the partial result isn't cached.
+
+        Args:
+            initial_url (str): The initial URL to query
+            headers (dict): Headers to include in the request (default: the client's headers)
+            limit (int): Number of items per page (default: 100)
+            show_progress (bool): Whether to show a progress bar (default: True)
+            debug (bool): Whether to print debug information (default: False)
+            workers (int): Fetch the remaining pages concurrently with this many threads once
+                the total is known from X-Page-Total. Only applies to page-number pagination,
+                cursor ('next') responses are always walked in order (default: None, serial)
+            job_id (str): Journal each page under this name so a failed or interrupted run can
+                be resumed by calling again with the same job_id, see resumable_paginated (optional)
+            fields (list): Keep only these fields of each item, dotted for nested keys, e.g.
+                ['mac', 'name', 'ip_stat.ip']. Pages are projected as they arrive, so only the kept
+                fields stay in memory. With ijson installed list pages are decoded one item at a time,
+                which lowers peak memory but not time, the response body is still read in full (optional)
+            columnar (bool or Columnar): Collect the items into a Columnar, typed columns instead
+                of a list of dicts, which takes a fraction of the memory on large results.
+                Pass a Columnar to choose its categories (default: False)
+
+        Returns:
+            list: All items from the paginated API, or a Columnar
+
+        Example:
+            devices = client.get_paginated(f"sites/{site_id}/stats/devices", fields=["mac", "name", "status", "ip_stat.ip"])
+        """
+        if job_id is not None:
+            from .checkpoint import resumable_paginated
+            return resumable_paginated(self, initial_url, job_id, headers, limit=limit, show_progress=show_progress,
+                                       debug=debug, workers=workers, fields=fields, columnar=columnar)
+
+        if self.cache is not None:
+            cache_url = f"{self.url(initial_url)}#paginated-{limit}"
+            if fields:
+                cache_url += f"-{','.join('.'.join(path) for path in parse_fields(fields))}"
+            if columnar is not False:
+                # Columnar records are flattened, they mustn't be served to list callers
+                cache_url += "-columnar"
+            cached = self.cache.get(cache_url, self.token(headers))
+            if cached is not None:
+                all_items = loads(cached)
+                if isinstance(all_items, list):
+                    all_items = _columnar(columnar, all_items)
+                print(f"Pagination type detected: cached")
+                print(f"Total items retrieved: {len(all_items) if isinstance(all_items, (list, Columnar)) else 'N/A (not a list)'}")
+                return all_items
+
+        all_items = _columnar(columnar)
+        pbar = None
+        info = {}
+
+        for page_items in self._walk_pages(initial_url, headers, limit=limit, debug=debug, workers=workers, info=info,
+                                           fields=fields):
+            if info['type'] == 'unknown':
+                all_items = page_items
                 break
+            # Setup progress bar if requested
+            if show_progress and pbar is None:
+                desc = "Fetching data" if info['type'] == 'results' else "Fetching pages (list endpoint)"
+                pbar = tqdm(total=info['total'], desc=desc)
+            all_items.extend(page_items)
+            if pbar is not None:
+                pbar.update(len(page_items))
+
+        if pbar is not None:
+            pbar.close()
+
+        print(f"Pagination type detected: {info.get('type')}")
+        print(f"Total items retrieved: {len(all_items) if isinstance(all_items, (list, Columnar)) else 'N/A (not a list)'}")
 
-            # Avoid rate limiting
-            time.sleep(0.1)
+        # A walk that stopped on a failed page is incomplete and not cached
+        if self.cache is not None and not info.get('error'):
+            self.cache.set(cache_url, dumpb(all_items.records() if isinstance(all_items, Columnar) else all_items),
+                           self.token(headers))
 
+        return all_items
+
+def _columnar(columnar, items=()):
+    # Container for get_paginated's items: the Columnar passed as columnar=, a new one
+    # for True, otherwise a list
+    if isinstance(columnar, Columnar):
+        result = columnar
+    elif columnar:
+        result = Columnar()
     else:
-        # Unknown pagination type or no pagination
-        pagination_type = 'unknown'
-        debug_print(f"Unknown pagination type or no pagination")
-        debug_print(f"Response type: {type(data)}")
-        if isinstance(data, dict):
-            debug_print(f"Response keys: {list(data.keys())}")
-        all_items = data
+        return list(items)
+    result.extend(items)
+    return result
+
+def _warn_incomplete(url, reason, items, total):
+    # Report a paginated fetch that stopped on a failed page, returning the details
+    of_total = f" of {total}" if total is not None else ""
+    print(f"Warning: pagination stopped early at {url} ({reason}), {items}{of_total} items retrieved")
+    return {'url': url, 'reason': reason, 'items': items, 'total': total}
+
+def _stored_response(response, entry):
+    # Copy of a 304 response carrying the stored 200 body and headers
+    stored = requests.Response()
+    stored.status_code = 200
+    stored._content = entry['body']
+    stored.headers = requests.structures.CaseInsensitiveDict(entry['headers'])
+    stored.headers.update(response.headers)
+    stored.url = response.url
+    stored.request = response.request
+    stored.encoding = response.encoding or requests.utils.get_encoding_from_headers(stored.headers)
+    stored.elapsed = response.elapsed
+    stored.attempts = getattr(response, 'attempts', 1)
+    return stored
+
+def _parse_body(response):
+    # JSON body of a response, the raw text if it isn't JSON (e.g. an HTML error page), None if empty
+    if not response.content.strip():
+        return None
+    try:
+        return loads(response.content)
+    except ValueError:
+        return response.text
+
+def _next_url(base_url, data):
+    # Absolute URL of the 'next' field in a results response, None on the last page
+    next_path = data.get('next')
+    if not next_path:
+        return None
+    # Handle relative URLs by prepending the base URL
+    if next_path.startswith('/'):
+        return f"{base_url}{next_path}"
+    return next_path
+
+def _url_page(url):
+    # Page number in url's page parameter, 1 if it has none
+    match = re.search(r'[?&]page=(\d+)', url)
+    return int(match.group(1)) if match else 1
+
+def _page_url(url, page):
+    # Return url with its page parameter set to page
+    if 'page=' in url:
+        return re.sub(r'page=\d+', f'page={page}', url)
+    if '?' in url:
+        return f"{url}&page={page}"
+    return f"{url}?page={page}"
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def default_client():
+    # Shared client used by the module level functions, created on first use
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = MistClient()
+    return _default_client
+
+def set_default_client(client):
+    # Replace the shared client, e.g. with a larger pool or a different timeout
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
+
+def post(data, url, headers, retry=None):
+#POST data to mist. input requires (data, url, headers). retry=True also retries on errors, a POST is not retried by default
+    return default_client().post(data, url, headers, retry=retry)
+ 
+def put(data, url, headers):
+#PUT data to mist. input requires (data, url, headers)
+    return default_client().put(data, url, headers)
+
+def delete(url, headers):
+    # DELETE data from mist. URL requires full endpoint to remove. Input requires (url, headers)
+    return default_client().delete(url, headers)
 
-    if pbar is not None:
-        pbar.close()
+def get(url, headers):
+    # GET data from mist. input requires (url, headers). return will be an array of the response
+    return default_client().get(url, headers)
+
+def get_paginated(initial_url, headers, limit=100, show_progress=True, debug=False, workers=None, job_id=None, fields=None,
+                  columnar=False):
+    """
+    Get all paginated results from the MIST API using the shared client.
+    See MistClient.get_paginated for details.
+
+    Args:
+        initial_url (str): The initial URL to query
+        headers (dict): Headers to include in the request
+        limit (int): Number of items per page (default: 100)
+        show_progress (bool): Whether to show a progress bar (default: True)
+        debug (bool): Whether to print debug information (default: False)
+        workers (int): Number of threads used to fetch pages concurrently (default: None, serial)
+        job_id (str): Journal pages under this name so the crawl can be resumed (optional)
+        fields (list): Keep only these fields of each item, dotted for nested keys (optional)
+        columnar (bool): Return a Columnar of typed columns instead of a list of dicts (default: False)
+
+    Returns:
+        list: All items from the paginated API, or a Columnar
+    """
+    return default_client().get_paginated(initial_url, headers, limit=limit, show_progress=show_progress, debug=debug,
+                                          workers=workers, job_id=job_id, fields=fields, columnar=columnar)
 
-    print(f"Pagination type detected: {pagination_type}")
-    print(f"Total items retrieved: {len(all_items) if isinstance(all_items, list) else 'N/A (not a list)'}")
+def iter_pages(initial_url, headers, limit=100, debug=False, workers=None, fields=None):
+    # Yield each page of a paginated endpoint as it arrives. See MistClient.iter_pages
+    return default_client().iter_pages(initial_url, headers, limit=limit, debug=debug, workers=workers, fields=fields)
 
-    return all_items
\ No newline at end of file
+def iter_paginated(initial_url, headers, limit=100, debug=False, workers=None, fields=None):
+    # Yield items from a paginated endpoint one at a time. See MistClient.iter_paginated
+    return default_client().iter_paginated(initial_url, headers, limit=limit, debug=debug, workers=workers, fields=fields)
@@ -1,10 +1,15 @@
 import json
 import requests
-from typing import Dict, List
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
 from pathlib import Path
 from prettytable import PrettyTable
 from datetime import datetime
 import re
+from .files import write_atomic
 
 # Define available environments with their corresponding API URLs at module level
 ENVIRONMENTS = {
@@ -46,6 +51,13 @@ ENVIRONMENTS = {
     }
 }
 
+# Token metadata and validation results are indexed here so stored tokens can be listed
+# and reused without parsing every env file or calling /self each time
+INDEX_FILE = "index.json"
+
+# Seconds a successful /self validation is trusted before checking again
+VALIDATION_TTL = 12 * 60 * 60
+
 def get_headers(token):
     '''
     This will build the required headers for API interation.
@@ -93,6 +105,94 @@ def display_user_info(user_data: Dict):
     print("\nUser Information:")
     print(table)
 
+# Held around every read-modify-write of the token index. API workers invalidate
+# validations on 401s from many threads at once
+_index_lock = threading.RLock()
+
+def token_hash(api_token: str) -> str:
+    """
+    Short hash identifying a token, so the index never holds the token itself
+    """
+    token = api_token.split(' ', 1)[1] if api_token.startswith('Token ') else api_token
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+def load_token_index(config_dir: Path) -> Dict:
+    """
+    Read the token index, keyed by env file name
+    Args:
+        config_dir (Path): Directory containing token files
+    Returns:
+        dict: Index entries, empty if there is no index yet
+    """
+    try:
+        return json.loads((config_dir / INDEX_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def save_token_index(config_dir: Path, index: Dict):
+    """
+    Write the token index atomically, so concurrent jobs never read a partial file
+    """
+    write_atomic(config_dir / INDEX_FILE, json.dumps(index, indent=4))
+
+def refresh_token_index(config_dir: Path) -> Dict:
+    """
+    Bring the token index up to date with the env files on disk. Only files that are new
+    or whose size/modification time changed are parsed
+    Args:
+        config_dir (Path): Directory containing token files
+    Returns:
+        dict: Index entries, keyed by env file name
+    """
+    with _index_lock:
+        return _refresh_token_index(config_dir)
+
+def _refresh_token_index(config_dir: Path) -> Dict:
+    index = load_token_index(config_dir)
+    changed = False
+    seen = set()
+    with os.scandir(config_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith(".env"):
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            cached = index.get(entry.name)
+            if cached and cached.get("mtime_ns") == stat.st_mtime_ns and cached.get("size") == stat.st_size:
+                continue
+            try:
+                data = json.loads(Path(entry.path).read_text())
+            except Exception:
+                data = {}
+            if not all(key in data for key in ["api_token", "api_url"]):
+                index.pop(entry.name, None)
+                changed = True
+                continue
+            new_hash = token_hash(data["api_token"])
+            record = {
+                "org_name": data.get("org_name", "N/A"),
+                "org_id": data.get("org_id"),
+                "api_url": data["api_url"],
+                "environment": data.get("environment", "Unknown"),
+                "created": data.get("created", "Unknown"),
+                "token_hash": new_hash,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size
+            }
+            # Keep the validation result if only the metadata changed
+            if cached and cached.get("token_hash") == new_hash:
+                for key in ("validated_at", "user_info"):
+                    if key in cached:
+                        record[key] = cached[key]
+            index[entry.name] = record
+            changed = True
+    for name in [name for name in index if name not in seen]:
+        del index[name]
+        changed = True
+    if changed:
+        save_token_index(config_dir, index)
+    return index
+
 def get_existing_tokens(config_dir: Path, token_type: str = "org_token") -> List[Dict]:
     """
     Get list of existing tokens and their details
@@ -103,30 +203,84 @@ def get_existing_tokens(config_dir: Path, token_type: str = "org_token") -> List
         list: List of dictionaries containing token details
     """
     tokens = []
-    pattern = "*_org.env" if token_type == "org_token" else "*.env"
-    for file in config_dir.glob(pattern):
+    for filename, entry in sorted(refresh_token_index(config_dir).items()):
         # Skip regular env files when looking for org tokens
-        if token_type == "org_token" and not file.name.endswith("_org.env"):
+        if token_type == "org_token" and not filename.endswith("_org.env"):
             continue
         # Skip org env files when looking for regular tokens
-        if token_type == "regular" and file.name.endswith("_org.env"):
-            continue
-
-        try:
-            data = json.loads(file.read_text())
-            if all(key in data for key in ["api_token", "api_url"]):
-                tokens.append({
-                    "filename": file.name,
-                    "org_name": data.get("org_name", "N/A"),
-                    "api_url": data["api_url"],
-                    "environment": data.get("environment", "Unknown"),
-                    "created": data.get("created", "Unknown")
-                })
-        except Exception:
+        if token_type == "regular" and filename.endswith("_org.env"):
             continue
+        tokens.append({
+            "filename": filename,
+            "org_name": entry["org_name"],
+            "api_url": entry["api_url"],
+            "environment": entry["environment"],
+            "created": entry["created"]
+        })
     return tokens
 
-def get_credentials(environment: str = None, interactive: bool = True, org_token: bool = True, otp: bool = None) -> Dict[str, str]:
+def record_validation(config_dir: Path, filename: str, credentials: Dict, user_info: Dict):
+    """
+    Store a successful validation in the token index
+    Args:
+        config_dir (Path): Directory containing token files
+        filename (str): Env file the credentials were read from or saved to
+        credentials (dict): Validated credentials
+        user_info (dict): Response of the /self endpoint
+    """
+    with _index_lock:
+        index = refresh_token_index(config_dir)
+        entry = index.get(filename)
+        if entry is None or entry["token_hash"] != token_hash(credentials["api_token"]):
+            return
+        entry["validated_at"] = time.time()
+        entry["user_info"] = {
+            "name": user_info.get("name"),
+            "privileges": user_info.get("privileges", [])
+        }
+        save_token_index(config_dir, index)
+
+def validate_stored_credentials(config_dir: Path, filename: str, credentials: Dict, ttl: int = VALIDATION_TTL) -> Dict:
+    """
+    Validate stored credentials, using the cached /self result while it is younger than ttl
+    Args:
+        config_dir (Path): Directory containing token files
+        filename (str): Env file the credentials were read from
+        credentials (dict): Credentials to validate
+        ttl (int): Seconds a previous validation is trusted, 0 to always call /self
+    Returns:
+        dict: User information
+    """
+    entry = load_token_index(config_dir).get(filename)
+    if (ttl and entry and entry.get("user_info")
+            and entry.get("token_hash") == token_hash(credentials["api_token"])
+            and time.time() - entry.get("validated_at", 0) < ttl):
+        return entry["user_info"]
+    user_info = validate_credentials(credentials['api_url'], credentials['api_token'])
+    record_validation(config_dir, filename, credentials, user_info)
+    return user_info
+
+def invalidate_validation(api_token: str, config_dir: Optional[Path] = None):
+    """
+    Forget cached validations of a token, e.g. after the API answered 401
+    Args:
+        api_token (str): API token or Authorization header value
+        config_dir (Path): Directory containing token files (default: ~/.mistrs)
+    """
+    config_dir = config_dir or Path.home() / ".mistrs"
+    hashed = token_hash(api_token)
+    with _index_lock:
+        index = load_token_index(config_dir)
+        changed = False
+        for entry in index.values():
+            if entry.get("token_hash") == hashed and "validated_at" in entry:
+                del entry["validated_at"]
+                changed = True
+        if changed:
+            save_token_index(config_dir, index)
+
+def get_credentials(environment: str = None, interactive: bool = True, org_token: bool = True, otp: bool = None,
+                    validation_ttl: int = VALIDATION_TTL) -> Dict[str, str]:
     """
     Get API credentials from the environment file. Files are stored in .mistrs file at user home
 
@@ -135,6 +289,8 @@ def get_credentials(environment: str = None, interactive: bool = True, org_token
         interactive (bool): If True, allows user input for missing credentials.
         org_token (bool): If True, handles org token/one-time token flow (default)
         otp (bool): Deprecated, use org_token instead. For backward compatibility.
+        validation_ttl (int): Seconds a stored token's last successful validation is trusted
+            before /self is called again. 0 always validates (default: 12 hours)
 
     Returns:
         dict: Dictionary containing 'api_url', 'api_token', and additional metadata
@@ -231,6 +387,7 @@ def get_credentials(environment: str = None, interactive: bool = True, org_token
                                 safe_org_name = re.sub(r'[^a-zA-Z0-9]', '_', credentials['org_name'].lower())
                                 env_file = config_dir / f"{safe_org_name}_{environment}_org.env"
                                 env_file.write_text(json.dumps(credentials, indent=4))
+                                record_validation(config_dir, env_file.name, credentials, user_info)
                                 print(f"Org token saved at: {env_file}")
 
                             return credentials
@@ -246,7 +403,7 @@ def get_credentials(environment: str = None, interactive: bool = True, org_token
 
                         # Validate existing token
                         try:
-                            user_info = validate_credentials(credentials['api_url'], credentials['api_token'])
+                            user_info = validate_stored_credentials(config_dir, env_file.name, credentials, validation_ttl)
                             display_user_info(user_info)
                             return credentials
                         except ValueError as e:
@@ -269,7 +426,7 @@ def get_credentials(environment: str = None, interactive: bool = True, org_token
             env_file = config_dir / selected_token["filename"]
             credentials = json.loads(env_file.read_text())
             try:
-                user_info = validate_credentials(credentials['api_url'], credentials['api_token'])
+                user_info = validate_stored_credentials(config_dir, env_file.name, credentials, validation_ttl)
                 display_user_info(user_info)
                 return credentials
             except ValueError as e:
@@ -309,7 +466,7 @@ def get_credentials(environment: str = None, interactive: bool = True, org_token
                 if all(key in data for key in ["api_token", "api_url"]):
                     # Validate existing credentials
                     try:
-                        user_info = validate_credentials(data['api_url'], data['api_token'])
+                        user_info = validate_stored_credentials(config_dir, env_file.name, data, validation_ttl)
                         display_user_info(user_info)
                         return data
                     except ValueError:
@@ -341,6 +498,7 @@ def get_credentials(environment: str = None, interactive: bool = True, org_token
             display_user_info(user_info)
 
             env_file.write_text(json.dumps(credentials, indent=4))
+            record_validation(config_dir, env_file.name, credentials, user_info)
             print(f"Credentials saved at: {env_file}")
 
         except Exception as e:
@@ -0,0 +1,145 @@
+import json, threading, collections, itertools, copy
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+from .api import _parse_body
+from .serialize import dumpb
+from .adv import as_client
+from .ratelimit import RateLimiter
+
+class BulkReport:
+    """
+    Outcome of a bulk run. Each entry is a dict with the job's index, method, url and
+    payload plus its status and response body (or the error for requests that never
+    got a response).
+
+    Attributes:
+        succeeded (list): Jobs that returned a 2xx status
+        failed (list): Jobs that returned another status or raised
+        retried (list): Indexes of jobs that needed more than one attempt
+    """
+    def __init__(self):
+        self.succeeded = []
+        self.failed = []
+        self.retried = []
+        self._lock = threading.Lock()
+
+    def add(self, entry, attempts=1):
+        with self._lock:
+            if entry.get('error') is None and 200 <= entry['status'] < 300:
+                self.succeeded.append(entry)
+            else:
+                self.failed.append(entry)
+            if attempts > 1:
+                self.retried.append(entry['index'])
+
+    def summary(self):
+        # Counts of each outcome
+        return {
+            'succeeded': len(self.succeeded),
+            'failed': len(self.failed),
+            'retried': len(self.retried)
+        }
+
+    def failures_to_csv(self, file):
+        """
+        Write the failed jobs to a CSV that bulk_write can re-submit via jobs_from_csv.
+        The payload is stored as a JSON string.
+        """
+        from .data import create_csv
+        create_csv([{
+            'method': entry['method'],
+            'url': entry['url'],
+            'payload': json.dumps(entry['payload']) if entry['payload'] is not None else '',
+            'status': entry['status'],
+            'error': entry['error'] if entry['error'] is not None else json.dumps(entry['body'])
+        } for entry in sorted(self.failed, key=lambda entry: entry['index'])], file)
+
+    def __repr__(self):
+        return f"BulkReport({self.summary()})"
+
+def jobs_from_csv(file):
+    """
+    Read jobs written by BulkReport.failures_to_csv (or any CSV with method, url and
+    payload columns) back into (method, url, payload) tuples.
+    """
+    import csv
+    with open(file, newline='', encoding='utf-8') as fh:
+        return [(row['method'], row['url'], json.loads(row['payload']) if row.get('payload') else None)
+                for row in csv.DictReader(fh)]
+
+def bulk_write(jobs, client, workers=8, rate=None, retry_post=False, show_progress=True, failures_csv=None):
+    """
+    Run many POST/PUT/DELETE requests concurrently and report what happened to each.
+
+    Jobs are consumed lazily, at most workers * 2 are queued at once, so a generator of
+    millions of jobs is fine. Requests share the client's connection pool, rate limiter
+    and retry policy.
+
+    Args:
+        jobs (iterable): (method, url, payload) tuples. payload is ignored for DELETE
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        workers (int): Requests in flight at the same time (default: 8)
+        rate (float): Extra cap in requests per second for this run, on top of the
+            shared rate limiter (optional)
+        retry_post (bool): Also retry POST jobs on errors. 429s are always retried (default: False)
+        show_progress (bool): Whether to show a progress bar (default: True)
+        failures_csv (str): Write failed jobs to this CSV for re-submission (optional)
+
+    Returns:
+        BulkReport
+
+    Example:
+        jobs = [("PUT", f"sites/{site['id']}/setting", {"auto_upgrade": {"enabled": True}}) for site in sites]
+        report = bulk_write(jobs, credentials, workers=10, failures_csv="failed.csv")
+        print(report.summary())
+    """
+    client = as_client(client, pool_size=workers)
+    budget = RateLimiter(rate=rate, burst=workers) if rate else None
+    retry = None
+    if retry_post:
+        retry = copy.copy(client.retry)
+        retry.retry_post = True
+    report = BulkReport()
+
+    def run(index, method, url, payload):
+        if budget is not None:
+            budget.acquire()
+        method = method.upper()
+        entry = {'index': index, 'method': method, 'url': url, 'payload': payload,
+                 'status': None, 'body': None, 'error': None}
+        attempts = 1
+        try:
+            kwargs = {'data': dumpb(payload)} if payload is not None and method != 'DELETE' else {}
+            response = client.request(method, url, retry=retry, **kwargs)
+            attempts = getattr(response, 'attempts', 1)
+            entry['status'] = response.status_code
+            entry['body'] = _parse_body(response)
+        except Exception as e:
+            entry['error'] = str(e)
+        finally:
+            client.invalidate(url)
+        report.add(entry, attempts)
+
+    total = len(jobs) if hasattr(jobs, '__len__') else None
+    pbar = tqdm(total=total, desc="Bulk requests") if show_progress else None
+    jobs = enumerate(jobs)
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(count):
+            for index, (method, url, payload) in itertools.islice(jobs, count):
+                pending.append(pool.submit(run, index, method, url, payload))
+        submit(workers * 2)
+        while pending:
+            pending.popleft().result()
+            submit(1)
+            if pbar is not None:
+                pbar.update(1)
+    if pbar is not None:
+        pbar.close()
+
+    summary = report.summary()
+    print(f"Done - {summary['succeeded']} succeeded, {summary['failed']} failed, {summary['retried']} retried")
+    if failures_csv and report.failed:
+        report.failures_to_csv(failures_csv)
+        print(f"Failed jobs saved to {failures_csv}")
+    return report
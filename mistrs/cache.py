@@ -0,0 +1,264 @@
+import abc, time, threading, hashlib, sqlite3, fnmatch, collections
+from pathlib import Path
+from urllib.parse import urlparse
+
+# Seconds a GET response stays fresh, matched against the URL path in order. 0 means never cache.
+# Fast moving data (stats, events, searches) is never cached by default
+DEFAULT_TTLS = [
+    ('*/stats*', 0),
+    ('*/search*', 0),
+    ('*/events*', 0),
+    ('*/self', 3600),
+    ('*/sites', 600),
+    ('*template*', 600),
+]
+
+class BaseCache(abc.ABC):
+    """
+    Common behaviour of the GET response caches. Entries are keyed by URL and a hash
+    of the token, hold the raw response body and expire after a per-endpoint TTL.
+    Subclasses implement get, set, invalidate and clear.
+
+    Args:
+        ttl (float): Seconds an entry stays fresh when no pattern in ttls matches (default: 60)
+        ttls (list): (glob pattern, seconds) pairs matched against the URL path, first match
+            wins (default: DEFAULT_TTLS)
+    """
+    def __init__(self, ttl=60, ttls=None):
+        self.ttl = ttl
+        self.ttls = list(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, url):
+        # TTL of the first pattern matching the URL path
+        path = urlparse(url).path
+        for pattern, ttl in self.ttls:
+            if fnmatch.fnmatch(path, pattern):
+                return ttl
+        return self.ttl
+
+    @abc.abstractmethod
+    def get(self, url, token=None):
+        # Cached body for url, None if missing or expired
+        pass
+
+    @abc.abstractmethod
+    def set(self, url, body, token=None):
+        # Store a response body for url
+        pass
+
+    @abc.abstractmethod
+    def invalidate(self, url):
+        # Drop every entry for the resource at url, its children and its parent collection
+        pass
+
+    @abc.abstractmethod
+    def clear(self):
+        # Drop everything
+        pass
+
+def cache_key(url, token=None):
+    # Cache key for a URL and token. Only a hash of the token is kept
+    token_hash = hashlib.sha256(token.encode()).hexdigest()[:16] if token else '-'
+    return f"{token_hash} {url}"
+
+def _related_paths(url):
+    # Path of a written resource and its parent collection, e.g. a PUT to /orgs/x/wlans/1
+    # also makes /orgs/x/wlans stale
+    path = urlparse(url).path.rstrip('/')
+    parent = path.rsplit('/', 1)[0]
+    return path, parent
+
+class LRUCache(BaseCache):
+    """
+    In-process cache holding the most recently used responses.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used is dropped (default: 1024)
+        ttl (float): Default TTL in seconds (default: 60)
+        ttls (list): Per-endpoint TTLs, see BaseCache (default: DEFAULT_TTLS)
+    """
+    def __init__(self, max_entries=1024, ttl=60, ttls=None):
+        super().__init__(ttl, ttls)
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url, token=None):
+        key = cache_key(url, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, url, body, token=None):
+        ttl = self.ttl_for(url)
+        if ttl <= 0:
+            return
+        key = cache_key(url, token)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, body, urlparse(url).path.rstrip('/'))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        path, parent = _related_paths(url)
+        with self._lock:
+            for key in [key for key, entry in self._entries.items()
+                        if entry[2] == parent or entry[2] == path or entry[2].startswith(path + '/')]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCache(BaseCache):
+    """
+    On-disk cache shared between runs, stored in ~/.mistrs by default.
+
+    Args:
+        path (str): Database file (default: ~/.mistrs/cache.sqlite)
+        max_bytes (int): Total body size kept before the least recently used entries are
+            evicted (default: 100MB)
+        ttl (float): Default TTL in seconds (default: 60)
+        ttls (list): Per-endpoint TTLs, see BaseCache (default: DEFAULT_TTLS)
+    """
+    def __init__(self, path=None, max_bytes=100 * 1024 * 1024, ttl=60, ttls=None):
+        super().__init__(ttl, ttls)
+        if path is None:
+            path = Path.home() / ".mistrs" / "cache.sqlite"
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, path TEXT, body BLOB, size INTEGER, expires REAL, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_path ON cache (path)")
+
+    def close(self):
+        self._db.close()
+
+    def get(self, url, token=None):
+        key = cache_key(url, token)
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT body, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return bytes(row[0])
+
+    def set(self, url, body, token=None):
+        ttl = self.ttl_for(url)
+        if ttl <= 0 or len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, path, body, size, expires, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(url, token), urlparse(url).path.rstrip('/'), body, len(body), now + ttl, now)
+            )
+            # Size based eviction, least recently used first
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                self._db.execute("DELETE FROM cache WHERE expires < ?", (now,))
+                rows = self._db.execute("SELECT key, size FROM cache ORDER BY accessed").fetchall()
+                total = sum(size for _, size in rows)
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    total -= size
+
+    def invalidate(self, url):
+        path, parent = _related_paths(url)
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM cache WHERE path = ? OR path = ? OR substr(path, 1, ?) = ?",
+                (parent, path, len(path) + 1, path + '/')
+            )
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM cache")
+
+class ValidatorStore:
+    """
+    Remembers ETag / Last-Modified validators and the matching body per URL, so repeated
+    GETs can be sent as conditional requests and a 304 answered from the stored body.
+
+    Args:
+        max_entries (int): URLs remembered before the least recently used is dropped (default: 256)
+        max_bytes (int): Largest body that is kept (default: 20MB)
+    """
+    def __init__(self, max_entries=256, max_bytes=20 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.not_modified = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url, token=None):
+        # Stored entry for url as a dict with etag, last_modified, body and headers, or None
+        key = cache_key(url, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def conditional_headers(self, entry):
+        # Request headers that ask the server to answer 304 if the stored body is still current
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def set(self, url, headers, body, token=None):
+        # Store the validators of a 200 response. Responses without validators are ignored
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not (etag or last_modified) or len(body) > self.max_bytes:
+            return
+        key = cache_key(url, token)
+        with self._lock:
+            self._entries[key] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'body': body,
+                'headers': dict(headers)
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        # Forget the resource at url, its children and its parent collection
+        path, parent = _related_paths(url)
+        with self._lock:
+            for key in list(self._entries):
+                entry_path = urlparse(key.split(' ', 1)[1]).path.rstrip('/')
+                if entry_path == parent or entry_path == path or entry_path.startswith(path + '/'):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,147 @@
+import json, contextlib
+from pathlib import Path
+from tqdm import tqdm
+from .adv import as_client
+from .files import write_atomic
+from .serialize import parse_fields, loads, dumpb
+from .columnar import Columnar
+from .api import _columnar
+
+def _journal_files(job_id, journal_dir=None):
+    # (state file, pages file) of a job, in ~/.mistrs/jobs by default
+    journal_dir = Path(journal_dir) if journal_dir else Path.home() / ".mistrs" / "jobs"
+    journal_dir.mkdir(parents=True, exist_ok=True)
+    return journal_dir / f"{job_id}.json", journal_dir / f"{job_id}.jsonl"
+
+def _save_state(state_file, state):
+    # Write the job state atomically so a crash never leaves a half written file
+    write_atomic(state_file, json.dumps(state, indent=2))
+
+def load_job(job_id, journal_dir=None):
+    """
+    Return the saved state of a crawl job, or None if there is no journal for it.
+
+    The state holds the url, limit and fields of the crawl, the pagination 'type' and 'total',
+    'pages' and 'items' fetched so far, 'last_url' (the last completed page) and
+    whether the crawl is 'complete'.
+    """
+    state_file, _ = _journal_files(job_id, journal_dir)
+    if not state_file.exists():
+        return None
+    return json.loads(state_file.read_text())
+
+def clear_job(job_id, journal_dir=None):
+    # Remove the journal of a crawl job so the next run starts from the first page
+    for path in _journal_files(job_id, journal_dir):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+def resumable_paginated(client, initial_url, job_id, headers=None, limit=100, show_progress=True, debug=False,
+                        workers=None, journal_dir=None, keep=False, fields=None, columnar=False):
+    """
+    get_paginated that can pick up where a failed or interrupted run stopped.
+
+    Every page is appended to a journal as soon as it arrives, together with the cursor
+    (the URL of the last completed page), the item count and the total. Running again
+    with the same job_id re-requests the last completed page to recover the cursor and
+    continues from there, so a crawl that dies at page 900 only loses the page in flight.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        initial_url (str): The initial URL to query
+        job_id (str): Name of the crawl, used as the journal file name
+        headers (dict): Headers to include in the request (default: the client's headers)
+        limit (int): Number of items per page (default: 100)
+        show_progress (bool): Whether to show a progress bar (default: True)
+        debug (bool): Whether to print debug information (default: False)
+        workers (int): Number of threads used to fetch pages concurrently (default: None, serial)
+        journal_dir (str): Directory for the journal (default: ~/.mistrs/jobs)
+        keep (bool): Keep the journal once the crawl is complete, so later runs with the
+            same job_id return the saved items without any requests (default: False)
+        fields (list): Keep only these fields of each item, see get_paginated (optional)
+        columnar (bool or Columnar): Return the items as a Columnar, see get_paginated (default: False)
+
+    Returns:
+        list: All items from the paginated API, or a Columnar
+
+    Example:
+        events = resumable_paginated(credentials, f"orgs/{org_id}/clients/events/search?duration=7d", "client-events")
+    """
+    client = as_client(client)
+    url = client.url(initial_url)
+    state_file, pages_file = _journal_files(job_id, journal_dir)
+
+    paths = parse_fields(fields)
+    fields = ['.'.join(path) for path in paths] if paths else None
+
+    state = load_job(job_id, journal_dir)
+    if state is not None and (state['url'] != url or state['limit'] != limit or state.get('fields') != fields):
+        raise ValueError(f"Job '{job_id}' was started for {state['url']} (limit {state['limit']}, "
+                         f"fields {state.get('fields') or 'all'}), use another job_id or clear_job('{job_id}')")
+    if state is None:
+        state = {'url': url, 'limit': limit, 'fields': fields, 'type': None, 'total': None, 'pages': 0, 'items': 0,
+                 'last_url': None, 'last_items': 0, 'size': 0, 'complete': False}
+
+    if not state['complete']:
+        # Drop a page that was written after the last saved state, it is fetched again
+        with open(pages_file, 'ab') as fh:
+            fh.truncate(state['size'])
+
+        info = {}
+        if state['last_url']:
+            print(f"Resuming job '{job_id}' after page {state['pages']} ({state['items']} items)")
+            # The last completed page is fetched again to recover the cursor, then skipped
+            pages = client._walk_pages(state['last_url'], headers, limit=limit, debug=debug, workers=workers,
+                                       info=info, offset=state['items'] - state['last_items'], fields=fields)
+            skip = True
+        else:
+            pages = client._walk_pages(url, headers, limit=limit, debug=debug, workers=workers, info=info,
+                                       fields=fields)
+            skip = False
+
+        pbar = None
+        with contextlib.closing(pages), open(pages_file, 'ab') as fh:
+            for page_items in pages:
+                if skip:
+                    skip = False
+                    continue
+                if show_progress and pbar is None and info['type'] != 'unknown':
+                    pbar = tqdm(total=info['total'], initial=state['items'], desc="Fetching data")
+                fh.write(dumpb(page_items) + b"\n")
+                fh.flush()
+                count = len(page_items) if isinstance(page_items, list) else 1
+                state.update({'type': info['type'], 'total': info['total'], 'pages': state['pages'] + 1,
+                              'items': state['items'] + count, 'last_url': info['url'],
+                              'last_items': count, 'size': fh.tell()})
+                _save_state(state_file, state)
+                if pbar is not None:
+                    pbar.update(count)
+        if pbar is not None:
+            pbar.close()
+
+        # Pages that fail after the first one end the walk with info['error'] set, and a
+        # total that wasn't reached also means the crawl stopped early
+        if info.get('error') or state['total'] is not None and state['items'] < state['total']:
+            print(f"Job '{job_id}' stopped at {state['items']} of {state['total']} items, "
+                  f"run again with the same job_id to resume")
+        else:
+            state['complete'] = True
+            _save_state(state_file, state)
+
+    all_items = _columnar(columnar)
+    with open(pages_file, 'rb') as fh:
+        for line in fh:
+            page_items = loads(line)
+            if state['type'] == 'unknown':
+                all_items = page_items
+                break
+            all_items.extend(page_items)
+
+    print(f"Pagination type detected: {state['type']}")
+    print(f"Total items retrieved: {len(all_items) if isinstance(all_items, (list, Columnar)) else 'N/A (not a list)'}")
+
+    if state['complete'] and not keep:
+        clear_job(job_id, journal_dir)
+    return all_items
@@ -0,0 +1,282 @@
+import math, itertools
+from array import array
+
+# String columns that repeat a handful of values across many records. They are stored as
+# integer codes into a list of the distinct values, like a pandas Categorical
+CATEGORIES = ('site_id', 'org_id', 'model', 'type', 'status', 'version', 'hw_rev', 'band', 'event_type')
+
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+def _split(rows, flatten, prefix=''):
+    # (name, values) for each key of a batch of dicts, None where a row lacks the key.
+    # Nested dicts become dotted columns, the same names pd.json_normalize and fields= use
+    for name in dict.fromkeys(itertools.chain.from_iterable(rows)):
+        values = [row.get(name) for row in rows]
+        if flatten and dict in set(map(type, values)):
+            present = [value for value in values if value is not None]
+            if all(type(value) is dict for value in present) and any(present):
+                yield from _split([{} if value is None else value for value in values], flatten, f"{prefix}{name}.")
+                continue
+        yield f"{prefix}{name}", values
+
+def _kind(values, categorical):
+    # Storage kind for a batch of values, None when they are all missing
+    types = set(map(type, values))
+    types.discard(type(None))
+    if not types:
+        return None
+    if types == {int}:
+        present = [value for value in values if value is not None]
+        return 'int' if _INT64[0] <= min(present) and max(present) <= _INT64[1] else 'object'
+    if types <= {int, float}:
+        return 'float'
+    if types == {bool}:
+        return 'bool'
+    if types == {str}:
+        return 'category' if categorical else 'object'
+    return 'object'
+
+def _merge(current, new):
+    # Kind that can hold both, ints widen to floats and anything else mixed becomes object
+    if current is None or current == new:
+        return new
+    if new is None:
+        return current
+    if {current, new} == {'int', 'float'}:
+        return 'float'
+    return 'object'
+
+class _Column:
+    # One column. Missing values are NaN for floats, code -1 for categories, None for
+    # objects and a mask byte for ints and bools
+    def __init__(self, categorical):
+        self.categorical = categorical
+        self.kind = None
+        self.size = 0
+        self.data = None
+        self.mask = None
+        self.categories = None
+        self.codes = None
+
+    def _reset(self, kind):
+        self.kind = kind
+        self.mask = None
+        if kind == 'int':
+            self.data = array('q')
+        elif kind == 'float':
+            self.data = array('d')
+        elif kind == 'bool':
+            self.data = array('b')
+        elif kind == 'category':
+            self.data = array('i')
+            self.categories, self.codes = [], {}
+        else:
+            self.data = []
+
+    def _store(self, values):
+        if self.kind == 'float':
+            self.data.extend([math.nan if value is None else value for value in values])
+        elif self.kind in ('int', 'bool'):
+            if None in values:
+                if self.mask is None:
+                    self.mask = bytearray(len(self.data))
+                self.mask.extend([value is None for value in values])
+                self.data.extend([0 if value is None else value for value in values])
+            else:
+                if self.mask is not None:
+                    self.mask.extend(bytes(len(values)))
+                self.data.extend(values)
+        elif self.kind == 'category':
+            codes, categories = self.codes, self.categories
+            for value in values:
+                if value is not None and value not in codes:
+                    codes[value] = len(categories)
+                    categories.append(value)
+            self.data.extend([-1 if value is None else codes[value] for value in values])
+        else:
+            self.data.extend(values)
+
+    def extend(self, values):
+        kind = _merge(self.kind, _kind(values, self.categorical))
+        if kind != self.kind:
+            # First values, or the column has to be widened: store what it holds again
+            previous = self.values()
+            self._reset(kind)
+            self._store(previous)
+        if kind is not None:
+            self._store(values)
+        self.size += len(values)
+
+    def pad(self, count):
+        # count missing values
+        if count:
+            self.extend([None] * count)
+
+    def values(self):
+        # Plain Python values, None where missing
+        if self.kind is None:
+            return [None] * self.size
+        if self.kind == 'float':
+            return [None if value != value else value for value in self.data]
+        if self.kind in ('int', 'bool'):
+            values = self.data.tolist() if self.kind == 'int' else [bool(value) for value in self.data]
+            if self.mask is not None:
+                values = [None if missing else value for value, missing in zip(values, self.mask)]
+            return values
+        if self.kind == 'category':
+            categories = self.categories
+            return [None if code < 0 else categories[code] for code in self.data]
+        return list(self.data)
+
+    def to_pandas(self):
+        import numpy as np
+        import pandas as pd
+        if self.kind in ('int', 'float', 'bool'):
+            values = np.array(self.data, dtype={'int': np.int64, 'float': np.float64, 'bool': np.bool_}[self.kind])
+            if self.mask is None:
+                return values
+            mask = np.array(self.mask, dtype=np.bool_)
+            if self.kind == 'int':
+                return pd.arrays.IntegerArray(values, mask)
+            return pd.arrays.BooleanArray(values, mask)
+        if self.kind == 'category':
+            return pd.Categorical.from_codes(np.array(self.data, dtype=np.int32), categories=self.categories)
+        return pd.array(self.values(), dtype=object)
+
+class Columnar:
+    """
+    Records stored column by column, for paginated results too large to keep as a list of dicts.
+
+    Numbers and booleans go into typed arrays, strings of the columns in categories are
+    stored once each with an integer code per record, and nested dicts become dotted
+    columns (e.g. 'ip_stat.ip'). A column that mixes types falls back to plain objects.
+    Pass one to create_csv, create_xlsx or analyze_errors as it is, or use to_pandas().
+
+    Args:
+        items (list): Records to start with (optional)
+        categories (tuple): Column names stored as categories (default: CATEGORIES)
+        flatten (bool): Store nested dicts as dotted columns (default: True)
+
+    Example:
+        stats = get_paginated(url, headers, columnar=True)
+        df = stats.to_pandas()
+        create_csv(stats, "device_stats.csv")
+    """
+    def __init__(self, items=None, categories=CATEGORIES, flatten=True):
+        self.categories = set(categories)
+        self.flatten = flatten
+        self._columns = {}
+        self._rows = 0
+        if items:
+            self.extend(items)
+
+    def extend(self, items):
+        # Add a page of records
+        items = [item if isinstance(item, dict) else {'value': item} for item in items]
+        if not items:
+            return
+        names = set()
+        for name, values in _split(items, self.flatten):
+            column = self._columns.get(name)
+            if column is None:
+                if all(value is None for value in values) and self._flattened(name):
+                    # Null on this page, the field is stored as its dotted columns
+                    continue
+                column = _Column(name in self.categories)
+                column.pad(self._rows)
+                self._add(name, column)
+            names.add(name)
+            column.extend(values)
+        for name, column in self._columns.items():
+            if name not in names:
+                column.pad(len(items))
+        self._rows += len(items)
+
+    def _flattened(self, name):
+        # Whether a field was flattened into dotted columns
+        prefix = f"{name}."
+        return any(existing.startswith(prefix) for existing in self._columns)
+
+    def _add(self, name, column):
+        # New columns go at the end, dotted ones after the other columns of the same field,
+        # so the order doesn't depend on which page flattened the field first. A column of
+        # the field that never had a value is replaced by its dotted columns
+        root = name.split('.')[0]
+        anchor = None
+        for existing in self._columns:
+            if existing == root or existing.startswith(f"{root}."):
+                anchor = existing
+        if anchor is None or '.' not in name:
+            self._columns[name] = column
+            return
+        parts = name.split('.')
+        parents = {'.'.join(parts[:i]) for i in range(1, len(parts))}
+        columns = {}
+        for existing, current in self._columns.items():
+            if existing not in parents or current.kind is not None:
+                columns[existing] = current
+            if existing == anchor:
+                columns[name] = column
+        self._columns = columns
+
+    def append(self, item):
+        self.extend([item])
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def kinds(self):
+        # {column: 'int', 'float', 'bool', 'category' or 'object'}, None for columns with no values yet
+        return {name: column.kind for name, column in self._columns.items()}
+
+    def column(self, name):
+        # Values of one column as a list, None where missing
+        return self._columns[name].values()
+
+    def __len__(self):
+        return self._rows
+
+    def __iter__(self):
+        # Records as dicts, missing values left out
+        names = list(self._columns)
+        for row in zip(*(column.values() for column in self._columns.values())):
+            yield {name: value for name, value in zip(names, row) if value is not None}
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("Columnar index out of range")
+        record = {}
+        for name, column in self._columns.items():
+            value = _value(column, index)
+            if value is not None:
+                record[name] = value
+        return record
+
+    def records(self):
+        # All records as a list of dicts
+        return list(self)
+
+    def to_pandas(self):
+        # DataFrame with one typed column per column, categories as pandas Categorical
+        import pandas as pd
+        return pd.DataFrame({name: column.to_pandas() for name, column in self._columns.items()},
+                            index=pd.RangeIndex(self._rows))
+
+    def __repr__(self):
+        return f"<Columnar {self._rows} records, {len(self._columns)} columns>"
+
+def _value(column, index):
+    # One value of a column without converting the whole column
+    if column.kind is None or column.mask is not None and column.mask[index]:
+        return None
+    value = column.data[index]
+    if column.kind == 'float':
+        return None if value != value else value
+    if column.kind == 'bool':
+        return bool(value)
+    if column.kind == 'category':
+        return None if value < 0 else column.categories[value]
+    return value
@@ -1,49 +1,191 @@
-import json
-import pandas as pd
+import json, csv, os
 from prettytable import PrettyTable
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 from datetime import datetime
 
+# pandas, matplotlib and seaborn take over a second to import, so they are only
+# imported inside the functions that need them
+
 def jprint(data):
     #Prints JSON in an easy to ready format
     print(json.dumps(data, indent=2, sort_keys=True))
 
+def _records(df):
+    # DataFrame rows as dicts of plain Python values, NaN as None and datetimes as epoch
+    # milliseconds. Same result as a to_json/json.loads round trip without the JSON text
+    import pandas as pd
+    names = [str(column) for column in df.columns]
+    columns = []
+    for _, series in df.items():
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = [None if pd.isna(value) else int(value.timestamp() * 1000) for value in series]
+        elif series.hasnans:
+            values = [None if value is pd.NA or value != value else value for value in series.tolist()]
+        else:
+            values = series.tolist()
+        columns.append(values)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+def _frame(data):
+    # DataFrame of a list of records. A Columnar (get_paginated(columnar=True)) already
+    # holds typed columns and is converted column by column, not record by record
+    import pandas as pd
+    if hasattr(data, 'to_pandas'):
+        return data.to_pandas()
+    return pd.DataFrame(data)
+
 def read_xlsx(file):
     #convert xlsx into an array
+    import pandas as pd
     df = pd.read_excel(file)
-    result = df.to_json(orient="records")
-    parsed = json.loads(result)
-    return parsed
+    return _records(df)
 
 def create_xlsx(data, file):
-    # creates an xlsx file from an array
-    df = pd.DataFrame(data)
+    # creates an xlsx file from an array or a Columnar
+    df = _frame(data)
     df.to_excel(file, index=False)
 
 def read_csv(file):
     #convert csv into an array
+    import pandas as pd
     df = pd.read_csv(file)
-    result = df.to_json(orient="records")
-    parsed = json.loads(result)
-    return parsed
+    return _records(df)
 
 def create_csv(data, file):
-    # creates a csv file from an array
-    df = pd.DataFrame(data)
+    # creates a csv file from an array or a Columnar. For exports too large for memory see stream_to_csv
+    df = _frame(data)
     df.to_csv(file, index=False)
 
+def stream_to_csv(records, file, chunk_size=5000, columns=None):
+    """
+    Write records to a CSV file as they are produced, holding one chunk at a time.
+
+    Columns are the union of the record keys in the order they are first seen. When a
+    later chunk brings new columns they are added at the end, and the file is rewritten
+    once when all records are written, so earlier rows get empty values for them.
+
+    Values are written as they are. Unlike create_csv, which goes through a DataFrame,
+    a number column with gaps keeps its integers (1, not 1.0).
+
+    Args:
+        records (iterable): Dicts, e.g. from iter_paginated, or lists of dicts such as the pages of iter_pages
+        file (str): Path of the CSV file
+        chunk_size (int): Records written at a time, pages are split into records first (default: 5000)
+        columns (list): Write only these columns, in this order (default: all of them)
+
+    Returns:
+        int: Number of records written
+
+    Example:
+        stream_to_csv(iter_paginated(f"orgs/{org_id}/clients/events/search?duration=7d", headers), "events.csv")
+    """
+    fieldnames = list(columns) if columns else []
+    known = set(fieldnames)
+    header_size = None
+    count = 0
+    with open(file, 'w', newline='', encoding='utf-8') as fh:
+        # Same line endings as DataFrame.to_csv
+        writer = csv.DictWriter(fh, fieldnames, restval='', extrasaction='ignore', lineterminator=os.linesep)
+
+        def write(chunk):
+            nonlocal header_size, count
+            if not columns:
+                for record in chunk:
+                    for key in record:
+                        if key not in known:
+                            known.add(key)
+                            fieldnames.append(key)
+            if header_size is None:
+                writer.writeheader()
+                header_size = len(fieldnames)
+            writer.writerows(chunk)
+            count += len(chunk)
+
+        # Chunks are counted in records, however the input is split into pages
+        chunk = []
+        for record in records:
+            if isinstance(record, list):
+                chunk.extend(record)
+            else:
+                chunk.append(record)
+            if len(chunk) >= chunk_size:
+                write(chunk)
+                chunk = []
+        if chunk:
+            write(chunk)
+        if header_size is None and fieldnames:
+            writer.writeheader()
+            header_size = len(fieldnames)
+
+    if header_size is not None and len(fieldnames) > header_size:
+        _widen_csv(file, fieldnames)
+    return count
+
+def _widen_csv(file, fieldnames):
+    # Rewrite a CSV with a new header, padding rows written before the last columns were added
+    temp = f"{file}.tmp"
+    with open(file, newline='', encoding='utf-8') as source, open(temp, 'w', newline='', encoding='utf-8') as target:
+        reader = csv.reader(source)
+        writer = csv.writer(target, lineterminator=os.linesep)
+        next(reader)
+        writer.writerow(fieldnames)
+        width = len(fieldnames)
+        for row in reader:
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            writer.writerow(row)
+    os.replace(temp, file)
+
+def iter_csv(file, chunk_size=10000, frames=False):
+    """
+    Read a CSV file a chunk at a time, for files too large to load with read_csv.
+
+    Args:
+        file (str): Path of the CSV file
+        chunk_size (int): Rows read at a time (default: 10000)
+        frames (bool): Yield each chunk as a DataFrame instead of records (default: False)
+
+    Yields:
+        dict: One record, the same values read_csv gives, or a DataFrame of up to chunk_size rows with frames=True
+
+    Example:
+        disconnects = sum(1 for event in iter_csv("events.csv") if event['type'] == 'AP_DISCONNECTED')
+    """
+    import pandas as pd
+    try:
+        reader = pd.read_csv(file, chunksize=chunk_size)
+    except pd.errors.EmptyDataError:
+        # e.g. stream_to_csv of no records
+        return
+    try:
+        for df in reader:
+            if frames:
+                yield df
+            else:
+                yield from _records(df)
+    finally:
+        reader.close()
+
 def list_ids(data):
     #creates a list of IDs to iterate over
     result = [item['id'] for item in data]
     return result
 
 
-def print_table(array, headers=None):
+def site_names(sites):
+    # {site_id: name} from a SiteDirectory, a {site_id: name} dict or a list of site dicts
+    if hasattr(sites, 'names'):
+        return sites.names()
+    if isinstance(sites, dict):
+        return sites
+    return {site['id']: site['name'] for site in sites}
+
+def print_table(array, headers=None, sites=None):
     '''
     Create PrettyTable object and return
     example usage print(print_table(data))
+    sites (SiteDirectory from get_sites, {id: name} dict or list of sites) adds a
+    site_name column to rows that have a site_id
     '''
     table = PrettyTable()
     single_column_header = 'value'
@@ -54,9 +196,15 @@ def print_table(array, headers=None):
             if headers:
                 table.field_names = headers
             else:
-                table.field_names = list(array[0].keys())
+                fields = list(array[0].keys())
+                if sites is not None and 'site_id' in fields and 'site_name' not in fields:
+                    fields.insert(fields.index('site_id') + 1, 'site_name')
+                table.field_names = fields
+            lookup = site_names(sites) if sites is not None else {}
             # Add rows using dictionary values
             for row in array:
+                if lookup and 'site_name' not in row:
+                    row = dict(row, site_name=lookup.get(row.get('site_id'), ''))
                 table.add_row([row.get(key, '') for key in table.field_names])
         # Check if the array is a 2D array (list of lists/tuples)
         elif isinstance(array[0], (list, tuple)) and not isinstance(array[0], str):
@@ -123,8 +271,8 @@ def analyze_errors(data, site_array=None, error='Error ', group_by='site', top_n
     Parameters:
     - error = str of error name
     - config: API configuration
-    - data: List of events pulled from API
-    - site_array: List of site information for lookups. items are a dict {'id': '12345', 'name':'site1'}
+    - data: List of events pulled from API, or a Columnar from get_paginated(columnar=True)
+    - site_array: Site information for lookups. A SiteDirectory from get_sites, or a list of dicts {'id': '12345', 'name':'site1'}
     - group_by: 'site' or 'ap' to determine grouping method
     - top_n: Optional integer to limit display to top N sites/APs with most errors
     - save_path: Optional path to save the figure
@@ -132,8 +280,12 @@ def analyze_errors(data, site_array=None, error='Error ', group_by='site', top_n
     Returns:
     - DataFrame with processed data
     """
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # Convert to DataFrame
-    df = pd.DataFrame(data)
+    df = _frame(data)
 
     # Convert timestamps to datetime
     df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
@@ -141,7 +293,7 @@ def analyze_errors(data, site_array=None, error='Error ', group_by='site', top_n
     # Add site name if grouping by site if site_array is provided
     if group_by == 'site':
         if site_array:  # Only map if site_array is provided and not empty
-            site_lookup = {site['id']: site['name'] for site in site_array}
+            site_lookup = site_names(site_array)
             df['site_name'] = df['site_id'].map(site_lookup)
             group_column = 'site_name'
         else:
@@ -152,7 +304,8 @@ def analyze_errors(data, site_array=None, error='Error ', group_by='site', top_n
         title = f'{error} by Access Point'
 
     # Group by selected column and date
-    grouped = df.groupby([df['datetime'].dt.date, group_column]).size().unstack().fillna(0)
+    # observed=True so categorical site_ids only give the sites that have events
+    grouped = df.groupby([df['datetime'].dt.date, group_column], observed=True).size().unstack().fillna(0)
 
     # If top_n is specified, filter to show only the top N sites/APs with most errors
     if top_n and top_n < len(grouped.columns):
@@ -0,0 +1,21 @@
+import os, tempfile
+from pathlib import Path
+
+def write_atomic(path, text):
+    """
+    Write a text file atomically. The text goes to a uniquely named temp file next to path,
+    which then replaces it, so readers never see a partial file and concurrent writers
+    (threads or processes) never share a temp file.
+    """
+    path = Path(path)
+    fd, tmp_file = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,239 @@
+import json, re, threading, time
+from urllib.parse import urlparse
+
+# Registered hooks. MistClient checks these lists before doing any timing, so with no
+# hooks registered instrumentation costs one list lookup per request
+_hooks = {'pre_request': [], 'post_request': [], 'page': []}
+
+def add_hook(event, hook):
+    """
+    Call hook on an event of every MistClient.
+
+    Events:
+        'pre_request': hook(method, url, headers, attempt) before each attempt. headers
+            is the dict about to be sent and may be changed
+        'post_request': hook(method, url, response, error, seconds, attempt) after each
+            attempt. response is None and error the exception if no response arrived
+        'page': hook(url, items, seconds) for each page of a paginated request, with the
+            seconds spent fetching it
+    """
+    if event not in _hooks:
+        raise ValueError(f"Unknown event '{event}', use one of: {', '.join(_hooks)}")
+    _hooks[event].append(hook)
+
+def remove_hook(event, hook):
+    if hook in _hooks.get(event, []):
+        _hooks[event].remove(hook)
+
+def _emit(hooks, *args):
+    # A failing hook is reported but never fails the request
+    for hook in list(hooks):
+        try:
+            hook(*args)
+        except Exception as e:
+            print(f"Warning: metrics hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+def timed_pages(pages, url):
+    # Wrap a page generator, reporting the time each page took to the 'page' hooks
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                page_items = next(pages)
+            except StopIteration:
+                return
+            _emit(_hooks['page'], url, len(page_items) if isinstance(page_items, list) else 1,
+                  time.perf_counter() - started)
+            yield page_items
+    finally:
+        pages.close()
+
+_ID_PATTERNS = (
+    (re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.I), '{id}'),
+    (re.compile(r'^[0-9a-f]{12}$', re.I), '{mac}'),
+    (re.compile(r'^\d+$'), '{n}'),
+)
+
+def endpoint_name(method, url):
+    # "GET orgs/{id}/sites" style name of a request, ids and MACs replaced so they group together
+    parts = []
+    for part in urlparse(url).path.strip('/').split('/'):
+        for pattern, name in _ID_PATTERNS:
+            if pattern.match(part):
+                part = name
+                break
+        parts.append(part)
+    path = '/'.join(parts)
+    path = re.sub(r'^api/v\d+/', '', path)
+    return f"{method.upper()} {path}"
+
+class MetricsCollector:
+    """
+    Collects request and pagination metrics from every MistClient while enabled.
+
+    Per endpoint it counts requests, errors, retries and 429s, bytes sent and received,
+    and keeps a latency histogram. Paginated requests also get page counts and timings.
+
+    Example:
+        with MetricsCollector() as metrics:
+            get_paginated(url, headers)
+        print(metrics.table())
+        open("mistrs.prom", "w").write(metrics.prometheus())
+    """
+    # Latency histogram bucket bounds in seconds
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.pages = {}
+
+    def enable(self):
+        add_hook('post_request', self._post_request)
+        add_hook('page', self._page)
+        return self
+
+    def disable(self):
+        remove_hook('post_request', self._post_request)
+        remove_hook('page', self._page)
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _post_request(self, method, url, response, error, seconds, attempt):
+        name = endpoint_name(method, url)
+        bytes_in = len(response.content) if response is not None else 0
+        body = response.request.body if response is not None and response.request is not None else None
+        bytes_out = len(body) if body else 0
+        with self._lock:
+            stats = self.endpoints.get(name)
+            if stats is None:
+                stats = self.endpoints[name] = {
+                    'requests': 0, 'errors': 0, 'retries': 0, 'throttled': 0, 'bytes_in': 0, 'bytes_out': 0,
+                    'seconds': 0.0, 'max_seconds': 0.0, 'buckets': [0] * (len(self.BUCKETS) + 1)
+                }
+            stats['requests'] += 1
+            if error is not None or response.status_code >= 400:
+                stats['errors'] += 1
+            if attempt > 1:
+                stats['retries'] += 1
+            if response is not None and response.status_code == 429:
+                stats['throttled'] += 1
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['buckets'][_bucket(self.BUCKETS, seconds)] += 1
+
+    def _page(self, url, items, seconds):
+        name = endpoint_name('GET', url)
+        with self._lock:
+            stats = self.pages.setdefault(name, {'pages': 0, 'items': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stats['pages'] += 1
+            stats['items'] += items
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def percentile(self, name, fraction):
+        # Upper bound of the histogram bucket holding the given fraction of an endpoint's requests
+        stats = self.endpoints[name]
+        target = fraction * stats['requests']
+        seen = 0
+        for bound, count in zip(self.BUCKETS + (stats['max_seconds'],), stats['buckets']):
+            seen += count
+            if seen >= target:
+                return min(bound, stats['max_seconds'])
+        return stats['max_seconds']
+
+    def summary(self):
+        """
+        One row per endpoint, slowest total time first.
+
+        Returns:
+            list: Dicts with endpoint, requests, errors, retries, throttled, bytes_in,
+                bytes_out, avg_ms, p95_ms, max_ms and, for paginated endpoints, pages and avg_page_ms
+        """
+        with self._lock:
+            rows = []
+            for name, stats in sorted(self.endpoints.items(), key=lambda item: -item[1]['seconds']):
+                pages = self.pages.get(name, {})
+                rows.append({
+                    'endpoint': name,
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'throttled': stats['throttled'],
+                    'bytes_in': stats['bytes_in'],
+                    'bytes_out': stats['bytes_out'],
+                    'avg_ms': round(stats['seconds'] / stats['requests'] * 1000, 1),
+                    'p95_ms': round(self.percentile(name, 0.95) * 1000, 1),
+                    'max_ms': round(stats['max_seconds'] * 1000, 1),
+                    'pages': pages.get('pages', ''),
+                    'avg_page_ms': round(pages['seconds'] / pages['pages'] * 1000, 1) if pages else ''
+                })
+            return rows
+
+    def table(self):
+        # Summary as a PrettyTable, see print_table
+        from .data import print_table
+        rows = self.summary()
+        return print_table(rows) if rows else "No requests recorded"
+
+    def to_json(self):
+        # Raw counters and histograms as JSON
+        with self._lock:
+            return json.dumps({'buckets': self.BUCKETS, 'endpoints': self.endpoints, 'pages': self.pages}, indent=2)
+
+    def prometheus(self):
+        # Metrics in the Prometheus text exposition format
+        lines = []
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            pages = sorted(self.pages.items())
+        counters = (
+            ('requests', 'mistrs_requests_total', 'HTTP requests sent, retries included'),
+            ('errors', 'mistrs_request_errors_total', 'Requests that failed or returned 4xx/5xx'),
+            ('retries', 'mistrs_request_retries_total', 'Requests that were a retry of an earlier attempt'),
+            ('throttled', 'mistrs_throttled_total', 'Requests answered 429 Too Many Requests'),
+            ('bytes_in', 'mistrs_response_bytes_total', 'Response body bytes received'),
+            ('bytes_out', 'mistrs_request_bytes_total', 'Request body bytes sent'),
+        )
+        for key, name, help_text in counters:
+            metric(name, 'counter', help_text)
+            for endpoint, stats in endpoints:
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {stats[key]}')
+
+        metric('mistrs_request_duration_seconds', 'histogram', 'Request latency')
+        for endpoint, stats in endpoints:
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ('+Inf',), stats['buckets']):
+                cumulative += count
+                lines.append(f'mistrs_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'mistrs_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["seconds"]}')
+            lines.append(f'mistrs_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["requests"]}')
+
+        metric('mistrs_pages_total', 'counter', 'Pages fetched by paginated requests')
+        for endpoint, stats in pages:
+            lines.append(f'mistrs_pages_total{{endpoint="{endpoint}"}} {stats["pages"]}')
+        metric('mistrs_page_seconds_total', 'counter', 'Time spent fetching pages')
+        for endpoint, stats in pages:
+            lines.append(f'mistrs_page_seconds_total{{endpoint="{endpoint}"}} {stats["seconds"]}')
+        return "\n".join(lines) + "\n"
+
+def _bucket(bounds, seconds):
+    # Index of the histogram bucket for a latency
+    for index, bound in enumerate(bounds):
+        if seconds <= bound:
+            return index
+    return len(bounds)
@@ -0,0 +1,125 @@
+import json, time
+from pathlib import Path
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from .auth import get_existing_tokens
+from .api import MistClient
+from .ratelimit import RateLimiter
+
+def load_org_tokens(environments=None, orgs=None, config_dir=None):
+    """
+    Credentials of every org token stored in ~/.mistrs, in the same shape as get_credentials().
+
+    Args:
+        environments (list): Only tokens of these ENVIRONMENTS keys, e.g. ['global01', 'emea01'] (optional)
+        orgs (list): Only these orgs, by org id or org name (optional)
+        config_dir (str): Directory containing token files (default: ~/.mistrs)
+
+    Returns:
+        list: Credentials dicts with api_token, api_url, org_id, org_name and environment
+    """
+    config_dir = Path(config_dir) if config_dir else Path.home() / ".mistrs"
+    credentials = []
+    for token in get_existing_tokens(config_dir, "org_token"):
+        if environments and token['environment'] not in environments:
+            continue
+        data = json.loads((config_dir / token['filename']).read_text())
+        if orgs and data.get('org_id') not in orgs and data.get('org_name') not in orgs:
+            continue
+        credentials.append(data)
+    return credentials
+
+def run_orgs(query, credentials=None, environments=None, orgs=None, workers=16, pool_size=8, host_rate=True,
+             config_dir=None, show_progress=True):
+    """
+    Run the same query against many orgs at once, e.g. every stored org token.
+
+    Orgs on the same API host (ENVIRONMENTS entry) share one connection pool and one
+    rate budget. Each org's token keeps its own adaptive rate limiter, as
+    Mist's limits are per token. A failing org is recorded with its error instead of
+    stopping the run.
+
+    Args:
+        query (callable or str): Called as query(client, org) with a MistClient for the org
+            and its credentials dict, or a path such as "orgs/{org_id}/sites" that is
+            fetched with all its pages
+        credentials (list): Credentials dicts to use instead of the stored org tokens (optional)
+        environments (list): Only stored tokens of these environments (optional)
+        orgs (list): Only these org ids or names (optional)
+        workers (int): Orgs queried at the same time (default: 16)
+        pool_size (int): Pooled connections per API host (default: 8)
+        host_rate (float): Requests per second allowed per API host across all its orgs. True uses
+            the rate of new limiters, ratelimit.DEFAULTS['rate'], and False turns the host
+            budget off (default: True)
+        config_dir (str): Directory containing token files (default: ~/.mistrs)
+        show_progress (bool): Whether to show a progress bar (default: True)
+
+    Returns:
+        dict: Keyed by org id, each {'org_name', 'environment', 'result', 'error', 'seconds'}
+
+    Example:
+        results = run_orgs("orgs/{org_id}/inventory", environments=['global01', 'emea01'])
+        for org_id, run in results.items():
+            print(run['org_name'], len(run['result'] or []), run['seconds'])
+    """
+    if credentials is None:
+        credentials = load_org_tokens(environments, orgs, config_dir)
+    if isinstance(query, str):
+        path = query
+        query = lambda client, org: list(client.iter_paginated(path.format(org_id=org.get('org_id'))))
+
+    # One session (connection pool) and rate budget per API host
+    sessions = {}
+    budgets = {}
+    for creds in credentials:
+        host = urlparse(creds['api_url']).netloc
+        if host not in sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            sessions[host] = session
+            if host_rate is True:
+                budgets[host] = RateLimiter(burst=pool_size)
+            else:
+                budgets[host] = RateLimiter(rate=host_rate, burst=pool_size) if host_rate else None
+
+    def run(creds):
+        host = urlparse(creds['api_url']).netloc
+        client = MistClient(creds, session=sessions[host], budget=budgets[host])
+        started = time.time()
+        try:
+            return query(client, creds), None, time.time() - started
+        except Exception as e:
+            return None, str(e), time.time() - started
+
+    results = {}
+    pbar = tqdm(total=len(credentials), desc="Querying orgs") if show_progress else None
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run, creds): creds for creds in credentials}
+            for future in as_completed(futures):
+                creds = futures[future]
+                result, error, seconds = future.result()
+                results[creds.get('org_id') or creds.get('org_name')] = {
+                    'org_name': creds.get('org_name'),
+                    'environment': creds.get('environment'),
+                    'result': result,
+                    'error': error,
+                    'seconds': round(seconds, 2)
+                }
+                if pbar is not None:
+                    pbar.update(1)
+    finally:
+        if pbar is not None:
+            pbar.close()
+        for session in sessions.values():
+            session.close()
+
+    failed = [run for run in results.values() if run['error']]
+    if failed:
+        print(f"{len(failed)} of {len(results)} orgs failed")
+    return results
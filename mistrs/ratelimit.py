@@ -0,0 +1,165 @@
+import time, threading, hashlib, email.utils
+from urllib.parse import urlparse
+
+# Defaults for new limiters. Mist allows 5000 calls per hour per token, so long running
+# jobs may want configure_rate_limit(rate=5000/3600, burst=5000)
+DEFAULTS = {
+    'rate': 10.0,      # requests per second when the API is healthy
+    'burst': 20,       # requests that can be sent back to back
+    'min_rate': 0.2    # floor for the rate after repeated 429s
+}
+
+class RateLimiter:
+    """
+    Adaptive token bucket shared by every call to one API host with one token.
+
+    Tokens refill at `rate` per second up to `burst`. A 429 halves the rate and pauses
+    the bucket for the Retry-After period, healthy responses raise the rate back
+    towards `max_rate` a little at a time.
+
+    Args:
+        rate (float): Requests per second (default: DEFAULTS['rate'])
+        burst (int): Bucket size (default: DEFAULTS['burst'])
+        min_rate (float): Lowest rate the limiter backs off to (default: DEFAULTS['min_rate'])
+    """
+    def __init__(self, rate=None, burst=None, min_rate=None):
+        self.max_rate = float(rate or DEFAULTS['rate'])
+        self.rate = self.max_rate
+        self.burst = burst or DEFAULTS['burst']
+        self.min_rate = min(min_rate or DEFAULTS['min_rate'], self.max_rate)
+        self.throttled = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # _updated is in the future while the bucket is paused
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self):
+        # Take a token and return how many seconds the caller must wait before sending
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(0.0, self._updated - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def acquire(self):
+        # Block until a request may be sent
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Stop handing out tokens for the given number of seconds
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, now + seconds)
+
+    def update(self, status_code, headers=None):
+        """
+        Adjust the limiter from a response.
+
+        Args:
+            status_code (int): HTTP status of the response
+            headers (dict): Response headers, used for Retry-After and X-RateLimit-*
+
+        Returns:
+            float: Seconds the limiter is paused for, 0 if the response was not throttled
+        """
+        headers = headers or {}
+        if status_code == 429:
+            with self._lock:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+            delay = retry_after(headers)
+            if delay is None:
+                delay = 1 / self.rate
+            self.pause(delay)
+            return delay
+
+        # Healthy response, creep back towards the configured budget
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+        # Some gateways announce the remaining budget, stop before hitting zero
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset is not None:
+            try:
+                if int(remaining) <= 0:
+                    delay = float(reset)
+                    if delay > 1e9:  # epoch timestamp rather than seconds
+                        delay -= time.time()
+                    if delay > 0:
+                        self.pause(delay)
+                        return delay
+            except (TypeError, ValueError):
+                pass
+        return 0.0
+
+def retry_after(headers):
+    # Seconds requested by a Retry-After header (delta seconds or HTTP date), None if absent
+    value = headers.get('Retry-After') if headers else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(url, token=None):
+    """
+    Shared limiter for an API host and token. Every client talking to the same host
+    with the same token draws from the same bucket.
+
+    Args:
+        url (str): Any URL on the API host
+        token (str): Authorization header value or API token (optional)
+
+    Returns:
+        RateLimiter
+    """
+    token_hash = hashlib.sha256(token.encode()).hexdigest()[:16] if token else None
+    key = (urlparse(url).netloc, token_hash)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.setdefault(key, RateLimiter())
+    return limiter
+
+def configure_rate_limit(rate=None, burst=None, min_rate=None):
+    """
+    Change the rate limit for all limiters, existing and new.
+
+    Example:
+        # Spread a long job over Mist's hourly budget
+        configure_rate_limit(rate=5000/3600, burst=5000)
+    """
+    if rate is not None:
+        DEFAULTS['rate'] = rate
+    if burst is not None:
+        DEFAULTS['burst'] = burst
+    if min_rate is not None:
+        DEFAULTS['min_rate'] = min_rate
+    with _limiters_lock:
+        for limiter in _limiters.values():
+            with limiter._lock:
+                limiter.max_rate = limiter.rate = float(DEFAULTS['rate'])
+                limiter.burst = DEFAULTS['burst']
+                limiter.min_rate = min(DEFAULTS['min_rate'], limiter.max_rate)
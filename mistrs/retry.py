@@ -0,0 +1,71 @@
+import random
+from .ratelimit import retry_after
+
+# Methods that can be repeated without changing the result
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+class RetryPolicy:
+    """
+    When and how long to wait before re-sending a failed request.
+
+    Idempotent requests (GET, PUT, DELETE) are retried on connection errors and on the
+    retryable status codes. POST is only retried when retry_post is set, except for 429
+    which means the request was rejected before being processed.
+
+    Args:
+        max_attempts (int): Total tries per request including the first (default: 4)
+        backoff (float): Delay before the first retry in seconds, doubled on every retry (default: 0.5)
+        max_backoff (float): Upper bound for a single delay in seconds (default: 30)
+        jitter (bool): Randomise delays so parallel workers don't retry in lockstep (default: True)
+        retry_statuses (tuple): HTTP status codes worth retrying (default: 429, 500, 502, 503, 504)
+        retry_connection_errors (bool): Retry connection failures and timeouts (default: True)
+        retry_post (bool): Also retry POST requests (default: False)
+
+    Example:
+        client = MistClient(credentials, retry=RetryPolicy(max_attempts=6, retry_post=True))
+    """
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=30, jitter=True,
+                 retry_statuses=(429, 500, 502, 503, 504), retry_connection_errors=True, retry_post=False):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_connection_errors = retry_connection_errors
+        self.retry_post = retry_post
+
+    def should_retry(self, method, attempt, status=None, error=None):
+        """
+        Decide whether to send the request again.
+
+        Args:
+            method (str): HTTP method of the request
+            attempt (int): Number of the attempt that just failed, starting at 1
+            status (int): HTTP status of the response, if one was received
+            error (Exception): Connection error raised instead of a response
+
+        Returns:
+            bool: True if the request should be re-sent
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if status == 429:
+            return True
+        if method.upper() not in IDEMPOTENT_METHODS and not self.retry_post:
+            return False
+        if error is not None:
+            return self.retry_connection_errors
+        return status in self.retry_statuses
+
+    def delay(self, attempt, headers=None):
+        # Seconds to wait before the next attempt. Retry-After wins over the backoff
+        requested = retry_after(headers)
+        if requested is not None:
+            return min(requested, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+# Policy used when retries are switched off
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -0,0 +1,123 @@
+import json, time, re, contextlib
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tqdm import tqdm
+from .adv import as_client
+
+# Seconds per unit of a Mist duration such as '7d' or '12h'
+DURATION_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_duration(duration):
+    # Convert a Mist duration ('30m', '12h', '7d', '1w') to seconds
+    match = re.fullmatch(r'(\d+)([mhdw])', str(duration).strip().lower())
+    if not match:
+        raise ValueError(f"Invalid duration '{duration}', use e.g. 30m, 12h, 7d or 1w")
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+def split_window(start, end, shards):
+    # Split [start, end) into shards contiguous windows of equal length
+    step = (end - start) / shards
+    edges = [int(start + step * i) for i in range(shards)] + [int(end)]
+    return [(edges[i], edges[i + 1]) for i in range(shards) if edges[i] < edges[i + 1]]
+
+def _window_url(url, start, end):
+    # url with its start/end set to the window and any duration removed
+    parsed = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k not in ('start', 'end', 'duration', 'page')]
+    query += [('start', start), ('end', end)]
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+def _event_key(event):
+    # Default identity of an event for de-duplication across window edges
+    return json.dumps(event, sort_keys=True, default=str)
+
+def search_events(client, url, start=None, end=None, duration=None, shards=8, workers=4, limit=1000,
+                  max_results=10000, min_window=60, key=None, show_progress=True):
+    """
+    Fetch a long events/search window as many smaller windows in parallel.
+
+    The window is split into shards, each fetched with the same pagination as
+    get_paginated. A window whose total reaches max_results (the search result cap)
+    is split in half again until it fits, so nothing is silently cut off. Events are
+    merged, de-duplicated and returned in timestamp order.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        url (str): Search URL, e.g. f"orgs/{org_id}/devices/events/search?type=AP_DISCONNECTED".
+            start/end/duration in the query string are used if not given as arguments
+        start (int): Window start, epoch seconds (optional)
+        end (int): Window end, epoch seconds (default: now)
+        duration (str): Window length ending at end, e.g. '7d' (default: '1d' if no start)
+        shards (int): Windows to split into up front (default: 8)
+        workers (int): Windows fetched at the same time (default: 4)
+        limit (int): Items per page (default: 1000)
+        max_results (int): Result cap of the search endpoint. A window reporting this
+            many results or more is subdivided (default: 10000)
+        min_window (int): Smallest window in seconds that is still subdivided (default: 60)
+        key (callable): Returns the identity of an event for de-duplication (default: the whole event)
+        show_progress (bool): Whether to show a progress bar (default: True)
+
+    Returns:
+        list: Events in timestamp order
+
+    Example:
+        events = search_events(credentials, f"orgs/{org_id}/devices/events/search?type=AP_DISCONNECTED&duration=7d")
+    """
+    client = as_client(client, pool_size=workers)
+    url = client.url(url)
+    key = key or _event_key
+
+    # Window from the arguments, falling back to the URL's query string
+    query = dict(parse_qsl(urlparse(url).query))
+    end = int(end or query.get('end') or time.time())
+    if start is None and query.get('start') and not duration:
+        start = int(query['start'])
+    if start is None:
+        start = end - parse_duration(duration or query.get('duration') or '1d')
+    start = int(start)
+
+    def fetch(window):
+        # All events of a window, or None if the window hit the result cap and must be split
+        window_start, window_end = window
+        info = {}
+        pages = client._walk_pages(_window_url(url, window_start, window_end), limit=limit, info=info)
+        events = []
+        with contextlib.closing(pages):
+            for page_items in pages:
+                total = info.get('total')
+                if (not events and total is not None and total >= max_results
+                        and window_end - window_start > min_window):
+                    return None
+                events.extend(page_items if isinstance(page_items, list) else [page_items])
+        if info.get('total') is not None and info['total'] >= max_results:
+            print(f"Warning: window {window_start}-{window_end} still reports {info['total']} results")
+        return events
+
+    seen = set()
+    merged = []
+    pbar = tqdm(total=end - start, desc="Searching", unit="s") if show_progress else None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(fetch, window): window for window in split_window(start, end, shards)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                window = pending.pop(future)
+                events = future.result()
+                if events is None:
+                    # Too many results, fetch both halves instead
+                    for half in split_window(window[0], window[1], 2):
+                        pending[pool.submit(fetch, half)] = half
+                    continue
+                for event in events:
+                    event_key = key(event)
+                    if event_key not in seen:
+                        seen.add(event_key)
+                        merged.append(event)
+                if pbar is not None:
+                    pbar.update(window[1] - window[0])
+    if pbar is not None:
+        pbar.close()
+
+    merged.sort(key=lambda event: event.get('timestamp', 0) if isinstance(event, dict) else 0)
+    print(f"Total events retrieved: {len(merged)}")
+    return merged
@@ -0,0 +1,124 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+def _json_loads(data):
+    # json.loads on bytes sniffs the encoding and decodes with surrogatepass, a plain
+    # UTF-8 decode (what the API sends) is faster
+    return json.loads(data.decode() if isinstance(data, (bytes, bytearray)) else data)
+
+# JSON backends as (loads, dumpb). Each takes the response bytes as they are and encodes
+# to bytes, which is what requests sends and the caches store
+BACKENDS = {
+    'json': (_json_loads, lambda obj: json.dumps(obj).encode()),
+}
+if orjson is not None:
+    BACKENDS['orjson'] = (orjson.loads, orjson.dumps)
+
+_backend = 'orjson' if orjson is not None else 'json'
+_loads, _dumpb = BACKENDS[_backend]
+
+def set_backend(name):
+    """
+    Choose the JSON library used by mistrs. 'orjson' (the default when it is installed)
+    is several times faster than the standard library 'json' on large payloads.
+    """
+    global _backend, _loads, _dumpb
+    if name not in BACKENDS:
+        raise ValueError(f"JSON backend '{name}' is not available, choose from: {', '.join(BACKENDS)}")
+    _backend = name
+    _loads, _dumpb = BACKENDS[name]
+
+def backend():
+    # Name of the JSON backend in use
+    return _backend
+
+def loads(data):
+    # Decode JSON from bytes or str. Invalid JSON raises ValueError with every backend
+    return _loads(data)
+
+def dumpb(obj):
+    # Encode to JSON bytes. Objects the fast backend can't encode (e.g. int dict keys) fall back to json
+    try:
+        return _dumpb(obj)
+    except TypeError:
+        return json.dumps(obj).encode()
+
+def dumps(obj):
+    # Encode to a JSON str
+    return dumpb(obj).decode()
+
+def parse_fields(fields):
+    """
+    Field paths for project() and load_page().
+
+    Args:
+        fields (str or list): Field names, dotted for nested keys, e.g.
+            ['mac', 'name', 'ip_stat.ip'] or "mac,name,ip_stat.ip". None keeps every field
+
+    Returns:
+        tuple: One tuple of keys per field, or None
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    return tuple(tuple(field.strip().split('.')) for field in fields if field.strip())
+
+def project(item, paths):
+    """
+    Copy of item with only the given fields. Nested fields keep their nesting, so
+    ('ip_stat', 'ip') gives {'ip_stat': {'ip': ...}}, and missing fields are left out.
+    Items that are not dicts are returned unchanged.
+    """
+    if not isinstance(item, dict):
+        return item
+    projected = {}
+    for path in paths:
+        source = item
+        for key in path[:-1]:
+            source = source.get(key)
+            if not isinstance(source, dict):
+                break
+        else:
+            if path[-1] in source:
+                target = projected
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = source[path[-1]]
+    return projected
+
+def load_page(data, paths=None):
+    """
+    Decode a page of a paginated response, keeping only the fields in paths (see parse_fields).
+
+    With ijson installed, list bodies (e.g. /stats/devices) are decoded one item at a time
+    and each item is projected as soon as it is read, so the full decoded items of a page
+    are never held at once. data is the whole body either way, and ijson is slower than
+    loads(), so this only lowers peak memory. Other bodies are decoded with loads() and then projected: the 'results'
+    of a search response, or the object itself when the response is not paginated.
+    """
+    if not paths:
+        return loads(data)
+    if ijson is not None and data.lstrip()[:1] in (b'[', '['):
+        try:
+            return [project(item, paths) for item in ijson.items(data, 'item', use_float=True)]
+        except ijson.JSONError as e:
+            # Same error type as loads()
+            raise ValueError(str(e)) from e
+    page = loads(data)
+    if isinstance(page, list):
+        return [project(item, paths) for item in page]
+    if isinstance(page, dict) and 'results' in page:
+        if isinstance(page['results'], list):
+            page['results'] = [project(item, paths) for item in page['results']]
+        return page
+    return project(page, paths)
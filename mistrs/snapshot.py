@@ -0,0 +1,194 @@
+import json, time, sqlite3, hashlib
+from pathlib import Path
+from .adv import as_client
+from .search import search_events
+
+# Endpoints synced by default. path is formatted with the org id, key is the field that
+# identifies a record (None to use a hash of the whole record). Endpoints with 'since'
+# accept a start time, so after the first sync (covering 'window') only newer records
+# are requested. The others are fetched in full and replace the stored records
+DEFAULT_ENDPOINTS = {
+    'sites': {'path': 'orgs/{org_id}/sites', 'key': 'id'},
+    'inventory': {'path': 'orgs/{org_id}/inventory', 'key': 'mac'},
+    'device_stats': {'path': 'orgs/{org_id}/stats/devices', 'key': 'mac'},
+    'templates': {'path': 'orgs/{org_id}/templates', 'key': 'id'},
+    'device_events': {'path': 'orgs/{org_id}/devices/events/search', 'key': None, 'since': True, 'window': '1d'},
+}
+
+# Seconds re-read before the last sync time, for events the API indexes late
+OVERLAP = 300
+
+def _record_key(record, field):
+    # Identity of a record in the store
+    if field and isinstance(record, dict) and record.get(field) is not None:
+        return str(record[field])
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode()).hexdigest()
+
+class Snapshot:
+    """
+    Local copy of Mist endpoints for one or more orgs, kept in a SQLite database.
+
+    Each record is stored as JSON under (endpoint, org_id, key), with the time of the last
+    sync per endpoint and org. Time filtered endpoints only fetch records newer than the
+    last sync, the rest are fetched in full and only changed records are written.
+
+    Args:
+        path (str): Database file (default: ~/.mistrs/snapshot.sqlite)
+        endpoints (dict): Endpoints to sync, see DEFAULT_ENDPOINTS (default: DEFAULT_ENDPOINTS)
+
+    Example:
+        with Snapshot() as snap:
+            snap.sync(credentials, [org_a, org_b])
+            inventory = snap.load('inventory', org_a)
+    """
+    def __init__(self, path=None, endpoints=None):
+        if path is None:
+            path = Path.home() / ".mistrs" / "snapshot.sqlite"
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self.endpoints = dict(DEFAULT_ENDPOINTS if endpoints is None else endpoints)
+        self._db = sqlite3.connect(self.path)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "endpoint TEXT, org_id TEXT, key TEXT, data TEXT, synced REAL, PRIMARY KEY (endpoint, org_id, key))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS syncs ("
+                "endpoint TEXT, org_id TEXT, last_sync REAL, items INTEGER, PRIMARY KEY (endpoint, org_id))"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def last_sync(self, name, org_id):
+        # Epoch time of the last successful sync of an endpoint for an org, None if never synced
+        row = self._db.execute(
+            "SELECT last_sync FROM syncs WHERE endpoint = ? AND org_id = ?", (name, org_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self, client, org_ids, names=None, full=False):
+        """
+        Bring the stored endpoints up to date.
+
+        Args:
+            client (MistClient or dict): Client, or credentials from get_credentials()
+            org_ids (str or list): Org id, or a list of org ids
+            names (list): Endpoints to sync (default: all configured endpoints)
+            full (bool): Ignore the last sync time and fetch everything again (default: False)
+
+        Returns:
+            dict: {(org_id, name): {'mode', 'fetched', 'changed', 'removed', 'seconds'}} for
+                each endpoint synced, or {'error': message} if it failed
+        """
+        client = as_client(client)
+        org_ids = [org_ids] if isinstance(org_ids, str) else list(org_ids)
+        results = {}
+        for org_id in org_ids:
+            for name in names or self.endpoints:
+                started = time.time()
+                try:
+                    result = self._sync_endpoint(client, org_id, name, full)
+                except Exception as e:
+                    result = {'error': str(e)}
+                    print(f"{name} ({org_id}) failed: {e}")
+                else:
+                    result['seconds'] = round(time.time() - started, 2)
+                    print(f"{name} ({org_id}): {result['mode']}, {result['fetched']} fetched, "
+                          f"{result['changed']} changed, {result['removed']} removed")
+                results[(org_id, name)] = result
+        return results
+
+    def _sync_endpoint(self, client, org_id, name, full):
+        endpoint = self.endpoints[name]
+        url = endpoint['path'].format(org_id=org_id)
+        started = time.time()
+        last_sync = None if full else self.last_sync(name, org_id)
+
+        if endpoint.get('since'):
+            # Only records since the last sync (less an overlap for late events)
+            mode = 'delta' if last_sync else 'initial'
+            start = last_sync - OVERLAP if last_sync else None
+            records = search_events(client, url, start=start, end=started, duration=endpoint.get('window', '1d'),
+                                    shards=1, workers=1, show_progress=False)
+        else:
+            mode = 'full'
+            records = list(client.iter_paginated(url))
+
+        rows = {_record_key(record, endpoint.get('key')): json.dumps(record, sort_keys=True) for record in records}
+        stored = dict(self._db.execute(
+            "SELECT key, data FROM records WHERE endpoint = ? AND org_id = ?", (name, org_id)
+        ))
+        changed = [(name, org_id, key, data, started) for key, data in rows.items() if stored.get(key) != data]
+        # Records missing from a full fetch no longer exist
+        removed = [] if endpoint.get('since') else [(name, org_id, key) for key in stored if key not in rows]
+
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records (endpoint, org_id, key, data, synced) VALUES (?, ?, ?, ?, ?)", changed
+            )
+            self._db.executemany("DELETE FROM records WHERE endpoint = ? AND org_id = ? AND key = ?", removed)
+            items = self._db.execute(
+                "SELECT COUNT(*) FROM records WHERE endpoint = ? AND org_id = ?", (name, org_id)
+            ).fetchone()[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs (endpoint, org_id, last_sync, items) VALUES (?, ?, ?, ?)",
+                (name, org_id, started, items)
+            )
+        return {'mode': mode, 'fetched': len(rows), 'changed': len(changed), 'removed': len(removed)}
+
+    def load(self, name, org_id=None, since=None):
+        """
+        Stored records of an endpoint.
+
+        Args:
+            name (str): Endpoint name
+            org_id (str): Only records of this org (default: all orgs)
+            since (float): Only records written by a sync at or after this epoch time (optional)
+
+        Returns:
+            list: Records as dicts, in the order they were stored
+        """
+        query = "SELECT data FROM records WHERE endpoint = ?"
+        params = [name]
+        if org_id is not None:
+            query += " AND org_id = ?"
+            params.append(org_id)
+        if since is not None:
+            query += " AND synced >= ?"
+            params.append(since)
+        return [json.loads(data) for (data,) in self._db.execute(query + " ORDER BY rowid", params)]
+
+    def to_parquet(self, directory, names=None):
+        """
+        Write each endpoint to <directory>/<name>.parquet, with an org_id column added.
+        Needs pandas and pyarrow (or fastparquet).
+
+        Returns:
+            list: Paths of the written files
+        """
+        import pandas as pd
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for name in names or self.endpoints:
+            rows = self._db.execute("SELECT org_id, data FROM records WHERE endpoint = ? ORDER BY rowid", (name,))
+            records = [dict(record if isinstance(record, dict) else {'value': record}, org_id=org_id)
+                       for org_id, record in ((org_id, json.loads(data)) for org_id, data in rows)]
+            if not records:
+                continue
+            df = pd.json_normalize(records)
+            # Lists and nested objects are kept as JSON text
+            for column in df.columns[df.dtypes == object]:
+                df[column] = df[column].map(lambda value: json.dumps(value) if isinstance(value, (list, dict)) else value)
+            path = directory / f"{name}.parquet"
+            df.to_parquet(path, index=False)
+            files.append(str(path))
+        return files
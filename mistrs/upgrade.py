@@ -0,0 +1,211 @@
+import time, math, itertools
+from .adv import as_client, site_fan_out
+from .bulk import bulk_write
+
+def plan_waves(devices, by='site', canary=None, wave_size=None):
+    """
+    Split devices into upgrade waves.
+
+    Args:
+        devices (iterable): Device dicts with at least id and site_id (model for by='model')
+        by (str): 'site' for one wave per site, 'model' for one wave per model, or None
+            to keep all devices together (default: 'site')
+        canary (float or int): First wave of this fraction (below 1) or number of devices,
+            spread over as many sites as possible (optional)
+        wave_size (int): Split waves larger than this (optional)
+
+    Returns:
+        list: Waves, each a list of device dicts
+
+    Example:
+        waves = plan_waves(aps, by='model', canary=0.05, wave_size=200)
+    """
+    devices = list(devices)
+    waves = []
+    if canary:
+        count = math.ceil(len(devices) * canary) if canary < 1 else int(canary)
+        # Round robin over sites so one site's problem doesn't look like the firmware's
+        by_site = {}
+        for device in devices:
+            by_site.setdefault(device.get('site_id'), []).append(device)
+        spread = [device for group in itertools.zip_longest(*by_site.values()) for device in group if device is not None]
+        canaries = spread[:count]
+        waves.append(canaries)
+        chosen = {id(device) for device in canaries}
+        devices = [device for device in devices if id(device) not in chosen]
+
+    if by is None:
+        groups = [devices] if devices else []
+    else:
+        field = {'site': 'site_id', 'model': 'model'}.get(by, by)
+        grouped = {}
+        for device in devices:
+            grouped.setdefault(device.get(field), []).append(device)
+        groups = list(grouped.values())
+
+    for group in groups:
+        size = wave_size or len(group)
+        waves.extend(group[i:i + size] for i in range(0, len(group), size))
+    return waves
+
+class UpgradeReport:
+    """
+    Outcome of upgrade_devices. devices maps each device id to a dict with its name, mac,
+    site_id, model, wave, the 'from' and 'to' versions, its status ('upgraded', 'downloaded'
+    when upgraded without a reboot, 'failed', 'timeout', 'skipped' or 'current' if it
+    already ran the version), the error if any, and 'seconds' from the upgrade call until
+    the device was back on the new version.
+
+    Attributes:
+        devices (dict): Per device results keyed by device id
+        waves (list): Per wave summaries with the counts of each status and its duration
+        stopped (str): Why the rollout stopped early, None if every wave ran
+    """
+    def __init__(self):
+        self.devices = {}
+        self.waves = []
+        self.stopped = None
+
+    def summary(self):
+        # Number of devices in each status
+        counts = {}
+        for device in self.devices.values():
+            counts[device['status']] = counts.get(device['status'], 0) + 1
+        return counts
+
+    def to_csv(self, file):
+        # Write the per device results to a CSV
+        from .data import create_csv
+        create_csv(list(self.devices.values()), file)
+
+    def __repr__(self):
+        return f"UpgradeReport({self.summary()})"
+
+def _device_done(stats, version, reboot=True):
+    # 'upgraded', 'downloaded', 'failed' or None while the device is still upgrading
+    fwupdate = stats.get('fwupdate') or {}
+    if fwupdate.get('status') in ('failed', 'error'):
+        return 'failed'
+    if stats.get('version') == version and stats.get('status') == 'connected':
+        return 'upgraded'
+    # Without a reboot the device keeps running its old version, the new one is only staged
+    if not reboot and (fwupdate.get('status') in ('upgraded', 'success') or (fwupdate.get('progress') or 0) >= 100):
+        return 'downloaded'
+    return None
+
+def upgrade_devices(client, devices, version, by='site', canary=None, wave_size=None, workers=8, rate=None,
+                    failure_threshold=0.1, timeout=1800, poll_interval=15, max_poll_interval=120,
+                    reboot=True, show_progress=True):
+    """
+    Upgrade devices to a firmware version in waves, checking each wave before the next.
+
+    Every wave's upgrade calls are sent concurrently within the rate budget, then the
+    devices' stats are polled per site, starting at poll_interval and backing off to
+    max_poll_interval, until each device reports the new version and is connected,
+    reports a failed upgrade or the timeout passes. If more than failure_threshold of a
+    wave fails, the remaining waves are skipped.
+
+    Args:
+        client (MistClient or dict): Client, or credentials from get_credentials()
+        devices (iterable): Device dicts with id and site_id, e.g. from get_inventory or
+            sites/{site_id}/stats/devices. A 'version' field lets current devices be skipped
+        version (str): Firmware version to upgrade to
+        by, canary, wave_size: How to split the devices into waves, see plan_waves
+        workers (int): Upgrade calls and site polls in flight at the same time (default: 8)
+        rate (float): Cap on upgrade calls per second (optional)
+        failure_threshold (float): Largest failed fraction of a wave that still lets the
+            rollout continue (default: 0.1)
+        timeout (int): Seconds a wave may take to come back before its stragglers count
+            as failed (default: 1800)
+        poll_interval (int): First wait between status polls in seconds (default: 15)
+        max_poll_interval (int): Longest wait between status polls in seconds (default: 120)
+        reboot (bool): Reboot devices into the new version. With False a device is done
+            once its firmware update reports the download finished (default: True)
+        show_progress (bool): Print progress per wave (default: True)
+
+    Returns:
+        UpgradeReport
+
+    Example:
+        inventory = get_inventory(credentials, org_id, hwtype='ap')
+        report = upgrade_devices(credentials, inventory.by_model('AP45'), "0.14.29411", canary=0.05)
+        report.to_csv("upgrade.csv")
+    """
+    client = as_client(client, pool_size=workers)
+    report = UpgradeReport()
+    waves = plan_waves(devices, by=by, canary=canary, wave_size=wave_size)
+
+    for number, wave in enumerate(waves, 1):
+        for device in wave:
+            report.devices[device['id']] = {
+                'id': device['id'], 'name': device.get('name'), 'mac': device.get('mac'),
+                'site_id': device.get('site_id'), 'model': device.get('model'), 'wave': number,
+                'from': device.get('version'), 'to': version, 'status': 'skipped', 'error': None, 'seconds': None
+            }
+
+    for number, wave in enumerate(waves, 1):
+        if report.stopped:
+            break
+        started = time.time()
+        results = {device['id']: report.devices[device['id']] for device in wave}
+        todo = [device for device in wave if device.get('version') != version]
+        for device in wave:
+            if device.get('version') == version:
+                results[device['id']]['status'] = 'current'
+        if show_progress:
+            print(f"Wave {number}/{len(waves)}: upgrading {len(todo)} devices")
+
+        # Upgrade calls, concurrently within the rate budget
+        jobs = [("POST", f"sites/{device['site_id']}/devices/{device['id']}/upgrade",
+                 {"version": version, "reboot": reboot}) for device in todo]
+        requested_at = {}
+        calls = bulk_write(jobs, client, workers=workers, rate=rate, show_progress=False)
+        for entry in calls.failed:
+            result = results[todo[entry['index']]['id']]
+            result['status'] = 'failed'
+            result['error'] = entry['error'] or f"HTTP {entry['status']}: {entry['body']}"
+        for entry in calls.succeeded:
+            device_id = todo[entry['index']]['id']
+            results[device_id]['status'] = 'upgrading'
+            requested_at[device_id] = time.time()
+
+        # Poll the wave's sites with backoff until every device is done or the wave times out
+        waiting = set(requested_at)
+        delay = poll_interval
+        while waiting and time.time() - started < timeout:
+            time.sleep(min(delay, max(0, timeout - (time.time() - started))))
+            delay = min(delay * 2, max_poll_interval)
+            sites = [{'id': site_id} for site_id in {results[device_id]['site_id'] for device_id in waiting}]
+            # Every page, a site with more devices than one page would otherwise time out its stragglers
+            stats, errors = site_fan_out(client, None, "sites/{site_id}/stats/devices?type=all", workers=workers,
+                                         paginated=True, sites=sites, show_progress=False)
+            for site_devices in stats.values():
+                for device_stats in site_devices if isinstance(site_devices, list) else []:
+                    device_id = device_stats.get('id')
+                    if device_id not in waiting:
+                        continue
+                    outcome = _device_done(device_stats, version, reboot)
+                    if outcome is not None:
+                        waiting.discard(device_id)
+                        results[device_id]['status'] = outcome
+                        results[device_id]['seconds'] = round(time.time() - requested_at[device_id], 1)
+                        if outcome == 'failed':
+                            results[device_id]['error'] = str(device_stats.get('fwupdate'))
+        for device_id in waiting:
+            results[device_id]['status'] = 'timeout'
+            results[device_id]['error'] = f"Not back on {version} after {timeout}s"
+
+        # Roll forward or stop on the wave's failure rate
+        counts = {}
+        for result in results.values():
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        attempted = len(todo)
+        failed = counts.get('failed', 0) + counts.get('timeout', 0)
+        report.waves.append({'wave': number, 'devices': len(wave), 'seconds': round(time.time() - started, 1), **counts})
+        if show_progress:
+            print(f"Wave {number}/{len(waves)} done in {time.time() - started:.0f}s: {counts}")
+        if attempted and failed / attempted > failure_threshold:
+            report.stopped = f"Wave {number}: {failed} of {attempted} devices failed"
+            print(f"Stopping rollout - {report.stopped}")
+
+    return report
@@ -0,0 +1,269 @@
+import asyncio, json, hmac, hashlib, csv, sqlite3
+from pathlib import Path
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+# Columns of the CSV and SQLite sinks, the rest of an event is kept as JSON in 'data'
+COLUMNS = ('timestamp', 'topic', 'type', 'org_id', 'site_id', 'ap', 'mac', 'text')
+
+def verify_signature(secret, body, headers):
+    """
+    Check a webhook body against the signature Mist sends with it, HMAC-SHA256 in
+    X-Mist-Signature-v2 or HMAC-SHA1 in X-Mist-Signature.
+    """
+    if isinstance(secret, str):
+        secret = secret.encode()
+    signature = headers.get('X-Mist-Signature-v2')
+    digest = hashlib.sha256
+    if signature is None:
+        signature = headers.get('X-Mist-Signature')
+        digest = hashlib.sha1
+    if not signature:
+        return False
+    return hmac.compare_digest(hmac.new(secret, body, digest).hexdigest(), signature)
+
+def to_records(payload):
+    """
+    Events of a webhook payload ({"topic": ..., "events": [...]}) as flat records, the same
+    shape as events/search results, so they can go straight into analyze_errors. The topic
+    is added to each record, and 'ap' is filled from 'mac' for device events without one.
+    """
+    topic = payload.get('topic')
+    records = []
+    for event in payload.get('events') or []:
+        record = dict(event, topic=topic)
+        if 'ap' not in record and topic == 'device-events' and record.get('mac'):
+            record['ap'] = record['mac']
+        records.append(record)
+    return records
+
+class MemorySink:
+    """
+    Keeps the newest records in memory.
+
+    Args:
+        max_records (int): Oldest records are dropped beyond this many (default: 100000)
+    """
+    def __init__(self, max_records=100000):
+        self.max_records = max_records
+        self._records = []
+
+    def write(self, records):
+        self._records.extend(records)
+        if len(self._records) > self.max_records:
+            del self._records[:len(self._records) - self.max_records]
+
+    def records(self):
+        return list(self._records)
+
+    def close(self):
+        pass
+
+class SQLiteSink:
+    """
+    Appends records to an events table in a SQLite database.
+
+    Args:
+        path (str): Database file (default: ~/.mistrs/webhooks.sqlite)
+    """
+    def __init__(self, path=None):
+        if path is None:
+            path = Path.home() / ".mistrs" / "webhooks.sqlite"
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS events ({', '.join(COLUMNS)}, data TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS events_time ON events (timestamp)")
+
+    def write(self, records):
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO events VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                [tuple(record.get(column) for column in COLUMNS) + (json.dumps(record),) for record in records]
+            )
+
+    def records(self, topic=None, since=None):
+        # Stored records, optionally of one topic and from an epoch time on
+        query, params = "SELECT data FROM events WHERE 1 = 1", []
+        if topic is not None:
+            query += " AND topic = ?"
+            params.append(topic)
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        return [json.loads(data) for (data,) in self._db.execute(query + " ORDER BY rowid", params)]
+
+    def close(self):
+        self._db.close()
+
+class CSVSink:
+    """
+    Appends records to a CSV file with the COLUMNS plus the full event as JSON in 'data'.
+
+    Args:
+        path (str): CSV file, created with a header row if it doesn't exist
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if new:
+            self._writer.writerow(COLUMNS + ('data',))
+            self._file.flush()
+
+    def write(self, records):
+        self._writer.writerows(
+            [record.get(column, '') for column in COLUMNS] + [json.dumps(record)] for record in records
+        )
+        self._file.flush()
+
+    def records(self):
+        with open(self.path, newline='', encoding='utf-8') as fh:
+            return [json.loads(row['data']) for row in csv.DictReader(fh)]
+
+    def close(self):
+        self._file.close()
+
+class WebhookReceiver:
+    """
+    asyncio HTTP server that receives Mist webhooks and stores their events.
+
+    Requests are answered as soon as their signature is checked and their events are
+    queued. A background task writes the queue to the sinks in batches. When the queue is
+    full, requests wait up to queue_timeout for room and are then answered 503, so Mist
+    retries them later instead of the receiver running out of memory.
+
+    Args:
+        secret (str): Webhook secret configured in Mist, None to accept unsigned requests
+        sinks (list): Where records are written (default: [MemorySink()])
+        host (str): Address to listen on (default: '0.0.0.0')
+        port (int): Port to listen on (default: 8080)
+        path (str): URL path of the webhook (default: '/webhook')
+        batch_size (int): Records written to the sinks at once (default: 500)
+        batch_interval (float): Longest wait in seconds before a partial batch is written (default: 1.0)
+        queue_size (int): Records held in memory before requests are pushed back (default: 10000)
+        queue_timeout (float): Seconds a request waits for queue room before a 503 (default: 5.0)
+
+    Example:
+        receiver = WebhookReceiver(secret, sinks=[SQLiteSink()], port=8080)
+        receiver.run()
+    """
+    def __init__(self, secret=None, sinks=None, host='0.0.0.0', port=8080, path='/webhook',
+                 batch_size=500, batch_interval=1.0, queue_size=10000, queue_timeout=5.0):
+        if web is None:
+            raise ImportError("mistrs.webhook requires aiohttp. Install it with: pip install aiohttp")
+        self.secret = secret
+        self.sinks = sinks if sinks is not None else [MemorySink()]
+        self.host = host
+        self.port = port
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.stats = {'requests': 0, 'records': 0, 'rejected': 0, 'throttled': 0, 'batches': 0}
+        self._queue = None
+        self._runner = None
+        self._writer = None
+
+    def records(self):
+        # Records stored by the first sink
+        return self.sinks[0].records()
+
+    async def _handle(self, request):
+        self.stats['requests'] += 1
+        body = await request.read()
+        if self.secret is not None and not verify_signature(self.secret, body, request.headers):
+            self.stats['rejected'] += 1
+            return web.Response(status=401, text="invalid signature")
+        try:
+            records = to_records(json.loads(body))
+        except (ValueError, AttributeError):
+            self.stats['rejected'] += 1
+            return web.Response(status=400, text="invalid payload")
+        # A payload is queued whole or not at all, so a retried 503 can't duplicate events
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        while self._queue.qsize() and self._queue.qsize() + len(records) > self.queue_size:
+            if loop.time() >= deadline:
+                self.stats['throttled'] += 1
+                return web.Response(status=503, text="busy", headers={'Retry-After': '5'})
+            await asyncio.sleep(0.05)
+        for record in records:
+            self._queue.put_nowait(record)
+        return web.Response(text="ok")
+
+    async def _write_batches(self):
+        # Drain the queue into the sinks a batch at a time, until stop() queues None
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = loop.time() + self.batch_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        loop = asyncio.get_running_loop()
+        for sink in self.sinks:
+            # SQLite and file writes would block the event loop
+            await loop.run_in_executor(None, sink.write, batch)
+        self.stats['records'] += len(batch)
+        self.stats['batches'] += 1
+
+    async def start(self):
+        # Start listening, returns once the server is accepting requests
+        # queue_size is enforced by _handle, per payload
+        self._queue = asyncio.Queue()
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = self._runner.addresses[0][1]
+        self._writer = asyncio.ensure_future(self._write_batches())
+
+    async def stop(self):
+        # Stop accepting requests, write what is still queued and close the sinks
+        await self._runner.cleanup()
+        self._queue.put_nowait(None)
+        await self._writer
+        for sink in self.sinks:
+            sink.close()
+
+    def run(self):
+        # Serve until interrupted with Ctrl+C
+        async def serve():
+            await self.start()
+            print(f"Receiving webhooks on http://{self.host}:{self.port}{self.path}")
+            try:
+                while True:
+                    await asyncio.sleep(3600)
+            finally:
+                await self.stop()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        print(f"Stopped - {self.stats['records']} records received")
@@ -33,5 +33,10 @@ setup(
         "tqdm>=4.67.1",
         "matplotlib>=3.9.4",
         "seaborn>=0.13.2"
-    ]
+    ],
+    extras_require={
+        "aio": ["aiohttp>=3.8.0"],
+        "fast": ["orjson>=3.6.0"],
+        "stream": ["ijson>=3.1"]
+    }
 )
\ No newline at end of file
@@ -0,0 +1,39 @@
+# Compares collecting device stats pages into a list of dicts (get_paginated's default) with
+# a Columnar (get_paginated(columnar=True)), then building the DataFrame create_csv writes.
+# Run with: python tests/columnar_benchmark.py [devices]
+import json, sys, time, tracemalloc
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mistrs.columnar import Columnar
+from mistrs.data import _frame
+from payloads import device
+
+DEVICES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+PAGE = 1000
+
+pages = [json.dumps([device(i) for i in range(start, min(start + PAGE, DEVICES))]).encode()
+         for start in range(0, DEVICES, PAGE)]
+
+def collect(result):
+    for page in pages:
+        result.extend(json.loads(page))
+    return result
+
+def measure(name, make):
+    # Time without tracing, then the memory held by the result with tracemalloc
+    start = time.perf_counter()
+    result = collect(make())
+    collected = time.perf_counter() - start
+    start = time.perf_counter()
+    _frame(result)
+    framed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = collect(make())
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:10} collect {collected:.2f}s  DataFrame {framed:.2f}s  held {held / 1e6:.0f} MB")
+
+print(f"{DEVICES} devices in pages of {PAGE}")
+measure('list', list)
+measure('Columnar', Columnar)
@@ -0,0 +1,148 @@
+# Local stand-in for the Mist API shared by the regression tests. Run with: python -m pytest tests
+import json, sys, threading, time, hashlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mistrs.api import MistClient
+from mistrs.retry import RetryPolicy
+
+ITEMS = 1050
+
+class MistServer:
+    """
+    Paginated endpoints over ITEMS records {'id': 0}, {'id': 1}, ...
+
+    sites/s1/stats/devices       list body with X-Page-Total/Limit/Page headers
+    orgs/o1/clients/search       {'results', 'total', 'limit'} without a cursor
+    orgs/o1/devices/events/search  {'results', 'total', 'limit', 'next'}
+    */search?start=&end=         server.events with start <= timestamp <= end, newest first,
+                                 'total' counting them all but at most search_cap returned
+    orgs/o1/sites                the sites list, with an ETag for each page that is
+                                 answered with 304 when sent back in If-None-Match
+
+    failures maps a page number to the statuses it answers with before it succeeds,
+    e.g. {3: [503, 503]}. delay(page) is slept before answering a page, to make pages
+    complete out of order. requests lists the page of every request received,
+    windows the (start, end) of every first page of a windowed search and not_modified
+    counts the 304 answers.
+    """
+    def __init__(self):
+        self.events = []
+        self.search_cap = 10000
+        self.windows = []
+        self.sites = [{"id": f"site-{i}", "name": f"Site {i}", "timezone": "UTC", "sitegroup_ids": []} for i in range(5)]
+        self.not_modified = 0
+        self.failures = {}
+        self.delay = None
+        self.requests = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _handler(self))
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/api/v1/"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def pages(self, path=None):
+        # Page numbers requested so far, for one path when given
+        with self._lock:
+            return [page for request_path, page in self.requests if path is None or request_path.endswith(path)]
+
+    def _answer(self, path, page):
+        with self._lock:
+            self.requests.append((path, page))
+            statuses = self.failures.get(page)
+            status = statuses.pop(0) if statuses else 200
+        if self.delay:
+            time.sleep(self.delay(page))
+        return status
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            limit = int(query.get('limit', [100])[0])
+            page = int(query.get('page', [1])[0])
+            status = server._answer(url.path, page)
+            if status != 200:
+                return self._send(status, {"detail": "failed"}, {"Retry-After": 0} if status == 429 else None)
+            if url.path.endswith("/sites"):
+                return self._sites(page, limit)
+            if "start" in query:
+                return self._window(url.path, query, page, limit)
+            items = [{"id": i} for i in range((page - 1) * limit, min(page * limit, ITEMS))]
+            if url.path.endswith("/search"):
+                body = {"results": items, "total": ITEMS, "limit": limit}
+                if "events" in url.path and page * limit < ITEMS:
+                    body["next"] = f"{url.path}?limit={limit}&page={page + 1}"
+                return self._send(200, body)
+            return self._send(200, items, {"X-Page-Total": ITEMS, "X-Page-Limit": limit, "X-Page-Page": page})
+
+        def _window(self, path, query, page, limit):
+            start, end = int(query['start'][0]), int(query['end'][0])
+            if page == 1:
+                with server._lock:
+                    server.windows.append((start, end))
+            events = sorted((event for event in server.events if start <= event['timestamp'] <= end),
+                            key=lambda event: -event['timestamp'])
+            returned = events[:server.search_cap]
+            body = {"results": returned[(page - 1) * limit:page * limit], "total": len(events), "limit": limit}
+            if page * limit < len(returned):
+                body["next"] = f"{path}?start={start}&end={end}&limit={limit}&page={page + 1}"
+            return self._send(200, body)
+
+        def _sites(self, page, limit):
+            items = server.sites[(page - 1) * limit:page * limit]
+            etag = '"' + hashlib.sha1(json.dumps(items).encode()).hexdigest() + '"'
+            headers = {"ETag": etag, "X-Page-Total": len(server.sites), "X-Page-Limit": limit, "X-Page-Page": page}
+            if self.headers.get("If-None-Match") == etag:
+                server.not_modified += 1
+                self.send_response(304)
+                for name, value in headers.items():
+                    self.send_header(name, str(value))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            return self._send(200, items, headers)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            status = server._answer(urlparse(self.path).path, 1)
+            self._send(status, {"ok": status == 200})
+
+        do_PUT = do_DELETE = do_POST
+
+    return Handler
+
+@pytest.fixture
+def server():
+    server = MistServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def client(server):
+    # No rate limiting or backoff, so retries are counted rather than waited for
+    client = MistClient({'api_url': server.url, 'api_token': 'test-token'}, rate_limit=False,
+                        retry=RetryPolicy(max_attempts=3, backoff=0, jitter=False))
+    yield client
+    client.close()
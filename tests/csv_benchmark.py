@@ -0,0 +1,35 @@
+# Compares create_csv on a list with stream_to_csv on a generator, and read_csv with iter_csv,
+# for a device events export. Run with: python tests/csv_benchmark.py [events]
+import sys, time, tempfile, os, tracemalloc
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mistrs.data import create_csv, stream_to_csv, read_csv, iter_csv
+from payloads import event
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+def events():
+    return (event(i) for i in range(EVENTS))
+
+def measure(name, function):
+    # Seconds of one run, then the peak memory of another with tracemalloc (which slows it down)
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:34} {seconds:.2f}s  peak {peak / 1e6:.0f} MB")
+
+def count(records):
+    return sum(1 for _ in records)
+
+print(f"{EVENTS} events")
+with tempfile.TemporaryDirectory() as tmp:
+    file = os.path.join(tmp, "events.csv")
+    measure("create_csv(list(events))", lambda: create_csv(list(events()), file))
+    measure("stream_to_csv(events)", lambda: stream_to_csv(events(), file))
+    measure("read_csv", lambda: count(read_csv(file)))
+    measure("iter_csv", lambda: count(iter_csv(file)))
+    measure("iter_csv(frames=True)", lambda: count(iter_csv(file, frames=True)))
@@ -0,0 +1,27 @@
+# Measures how long `import mistrs` takes in a fresh interpreter and checks that the heavy
+# data dependencies are not loaded by it. Run with: python tests/import_benchmark.py
+import subprocess, sys, statistics
+
+RUNS = 5
+BUDGET = 0.5  # seconds
+HEAVY = ('pandas', 'matplotlib', 'seaborn')
+
+CODE = f"""
+import sys, time
+start = time.perf_counter()
+import mistrs
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in {HEAVY!r} if m in sys.modules))
+"""
+
+timings = []
+for _ in range(RUNS):
+    out = subprocess.run([sys.executable, '-c', CODE], capture_output=True, text=True, check=True).stdout.split()
+    timings.append(float(out[0]))
+    if len(out) > 1:
+        sys.exit(f"import mistrs loaded heavy dependencies: {out[1]}")
+
+median = statistics.median(timings)
+print(f"import mistrs: median {median:.3f}s over {RUNS} runs (min {min(timings):.3f}s, max {max(timings):.3f}s)")
+if median > BUDGET:
+    sys.exit(f"import mistrs took {median:.3f}s, budget is {BUDGET}s")
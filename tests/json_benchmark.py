@@ -0,0 +1,67 @@
+# Compares the JSON backends of mistrs.serialize on a device stats payload, against the
+# former decode-to-str-then-parse path. Run with: python tests/json_benchmark.py [devices]
+import json, sys, time, statistics, tracemalloc
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mistrs import serialize
+from payloads import device
+
+DEVICES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+RUNS = 5
+
+def timed(function, *args):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+payload = [device(i) for i in range(DEVICES)]
+body = json.dumps(payload).encode()
+print(f"{DEVICES} devices, {len(body) / 1e6:.1f} MB, median of {RUNS} runs")
+print(f"{'json.loads(body.decode())':32} {timed(lambda: json.loads(body.decode())):.3f}s  (previous response.text path)")
+
+for name in serialize.BACKENDS:
+    serialize.set_backend(name)
+    decode = timed(serialize.loads, body)
+    encode = timed(serialize.dumpb, payload)
+    print(f"{name + ' loads(bytes)':32} {decode:.3f}s")
+    print(f"{name + ' dumpb':32} {encode:.3f}s")
+
+# Keeping five fields of each device, as get_paginated(fields=...) does per page
+paths = serialize.parse_fields(['mac', 'name', 'status', 'site_id', 'ip_stat.ip'])
+
+def peak_mb(function, *args):
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+def loads_project(data):
+    return [serialize.project(item, paths) for item in serialize.loads(data)]
+
+print(f"{'loads + project':32} {timed(loads_project, body):.3f}s  peak {peak_mb(loads_project, body):.0f} MB")
+if serialize.ijson is not None:
+    print(f"{'ijson load_page':32} {timed(serialize.load_page, body, paths):.3f}s  "
+          f"peak {peak_mb(serialize.load_page, body, paths):.0f} MB")
+else:
+    print("ijson is not installed, pip install ijson to compare incremental parsing")
+
+try:
+    import pandas as pd, tempfile, os
+except ImportError:
+    pd = None
+if pd is not None:
+    # read_csv used to go DataFrame -> to_json -> json.loads
+    from mistrs.data import _records
+    with tempfile.TemporaryDirectory() as tmp:
+        file = os.path.join(tmp, "devices.csv")
+        pd.json_normalize(payload).to_csv(file, index=False)
+        df = pd.read_csv(file)
+        print(f"{'read_csv via to_json/json.loads':32} {timed(lambda: json.loads(df.to_json(orient='records'))):.3f}s")
+        print(f"{'read_csv records':32} {timed(lambda: _records(df)):.3f}s")
+
+if 'orjson' not in serialize.BACKENDS:
+    print("orjson is not installed, pip install orjson to compare it")
@@ -0,0 +1,25 @@
+# Synthetic API payloads shared by the benchmarks
+
+def device(i):
+    # Roughly the shape and size of one entry of sites/{site_id}/stats/devices
+    return {
+        "id": f"00000000-0000-0000-1000-{i:012x}", "mac": f"5c5b35{i:06x}", "name": f"ap-{i}",
+        "model": "AP45" if i % 3 else "AP43", "type": "ap", "status": "connected", "version": "0.14.29411",
+        "site_id": f"978c48e6-6ef6-11e6-8bbf-{i % 50:012x}", "uptime": 86400 + i, "last_seen": 1700000000.5 + i,
+        "ip_stat": {"ip": f"10.0.{i // 256 % 256}.{i % 256}", "netmask": "255.255.255.0", "gateway": "10.0.0.1",
+                    "dns": ["10.0.0.2", "10.0.0.3"]},
+        "radio_stat": {band: {"channel": 36 + i % 8, "power": 17, "bandwidth": 80, "num_clients": i % 30,
+                              "util_all": 12, "noise_floor": -95, "tx_bytes": i * 1000, "rx_bytes": i * 900}
+                       for band in ("band_24", "band_5", "band_6")},
+        "port_stat": {f"eth{p}": {"up": True, "speed": 1000, "full_duplex": True, "rx_pkts": i * p, "tx_pkts": i}
+                      for p in range(2)},
+        "lldp_stat": {"system_name": "sw-1", "port_id": f"ge-0/0/{i % 48}", "power_draw": 13.2},
+    }
+
+def event(i):
+    # Roughly the shape of one result of orgs/{org_id}/devices/events/search
+    return {
+        "timestamp": 1700000000.0 + i * 0.5, "type": "AP_DISCONNECTED" if i % 4 else "AP_RECONNECTED",
+        "org_id": "3b2fc535-8266-4974-9f68-e55db37cf85f", "site_id": f"978c48e6-6ef6-11e6-8bbf-{i % 50:012x}",
+        "ap": f"5c5b35{i % 5000:06x}", "device_type": "ap", "text": f"Disconnected from switch port ge-0/0/{i % 48}",
+    }
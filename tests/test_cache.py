@@ -0,0 +1,125 @@
+# Response caches, their invalidation on writes and conditional GETs with stored validators
+import time
+import pytest
+from mistrs.api import MistClient
+from mistrs.cache import LRUCache, SQLiteCache, ValidatorStore, cache_key
+from mistrs.retry import RetryPolicy
+
+WLANS = "orgs/o1/wlans"
+
+@pytest.fixture(params=['lru', 'sqlite'])
+def cache(request, tmp_path):
+    # Caches every path, unlike DEFAULT_TTLS
+    if request.param == 'lru':
+        yield LRUCache(ttls=[])
+    else:
+        cache = SQLiteCache(tmp_path / "cache.sqlite", ttls=[])
+        yield cache
+        cache.close()
+
+def make_client(server, **kwargs):
+    return MistClient({'api_url': server.url, 'api_token': 'test-token'}, rate_limit=False,
+                      retry=RetryPolicy(max_attempts=1), **kwargs)
+
+def test_repeated_get_is_served_from_the_cache(server, cache):
+    client = make_client(server, cache=cache)
+    first = client.get(WLANS)
+    assert client.get(WLANS) == first
+    assert len(server.pages(WLANS)) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_get_paginated_is_served_from_the_cache(server, cache):
+    client = make_client(server, cache=cache)
+    first = client.get_paginated("sites/s1/stats/devices", show_progress=False)
+    server.requests.clear()
+    assert client.get_paginated("sites/s1/stats/devices", show_progress=False) == first
+    assert server.requests == []
+
+def test_default_ttls_never_cache_stats_and_searches(server):
+    client = make_client(server, cache=LRUCache())
+    for path in ("sites/s1/stats/devices", "orgs/o1/clients/search"):
+        client.get(path)
+        client.get(path)
+        assert len(server.pages(path)) == 2
+    client.get(WLANS)
+    client.get(WLANS)
+    assert len(server.pages(WLANS)) == 1
+
+def test_entries_expire_after_their_ttl(server):
+    client = make_client(server, cache=LRUCache(ttl=0.05, ttls=[]))
+    client.get(WLANS)
+    time.sleep(0.1)
+    client.get(WLANS)
+    assert len(server.pages(WLANS)) == 2
+
+def test_tokens_do_not_share_entries(server, cache):
+    client = make_client(server, cache=cache)
+    client.get(WLANS)
+    client.get(WLANS, headers={'Authorization': 'Token other-token'})
+    assert len(server.pages(WLANS)) == 2
+    assert 'test-token' not in cache_key(client.url(WLANS), 'Token test-token')
+
+@pytest.mark.parametrize("write", ["put", "post", "delete"])
+def test_writes_invalidate_the_resource_and_its_collection(server, cache, write):
+    client = make_client(server, cache=cache)
+    for path in (WLANS, f"{WLANS}/w1", f"{WLANS}/w1/derived", "orgs/o1/sites"):
+        client.get(path)
+    server.requests.clear()
+    if write == "delete":
+        client.delete(f"{WLANS}/w1")
+    else:
+        getattr(client, write)({"name": "guest"}, f"{WLANS}/w1")
+    for path in (WLANS, f"{WLANS}/w1", f"{WLANS}/w1/derived", "orgs/o1/sites"):
+        client.get(path)
+    assert [path for path, _ in server.requests if path.endswith(("/wlans", "/w1", "/derived", "/sites"))] == [
+        "/api/v1/orgs/o1/wlans/w1", "/api/v1/orgs/o1/wlans", "/api/v1/orgs/o1/wlans/w1",
+        "/api/v1/orgs/o1/wlans/w1/derived"]
+
+def test_lru_drops_the_least_recently_used():
+    cache = LRUCache(max_entries=2, ttls=[])
+    cache.set("https://api/a", b"a")
+    cache.set("https://api/b", b"b")
+    assert cache.get("https://api/a") == b"a"
+    cache.set("https://api/c", b"c")
+    assert cache.get("https://api/b") is None
+    assert cache.get("https://api/a") == b"a"
+    assert cache.get("https://api/c") == b"c"
+
+def test_sqlite_evicts_by_size_least_recently_used_first(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.sqlite", max_bytes=25, ttls=[])
+    for name in "abc":
+        if name == "c":
+            assert cache.get("https://api/a") == b"a" * 10
+        cache.set(f"https://api/{name}", name.encode() * 10)
+        time.sleep(0.01)
+    assert cache.get("https://api/b") is None
+    assert cache.get("https://api/a") == b"a" * 10
+    # Bodies larger than the cache are not stored at all
+    cache.set("https://api/d", b"d" * 30)
+    assert cache.get("https://api/d") is None
+    cache.close()
+
+def test_sqlite_entries_survive_a_new_instance(tmp_path):
+    SQLiteCache(tmp_path / "cache.sqlite", ttls=[]).set("https://api/a", b"a", "Token t")
+    cache = SQLiteCache(tmp_path / "cache.sqlite", ttls=[])
+    assert cache.get("https://api/a", "Token t") == b"a"
+    assert cache.get("https://api/a", "Token other") is None
+    cache.close()
+
+def test_not_modified_is_answered_from_stored_validators(server):
+    validators = ValidatorStore()
+    client = make_client(server, validators=validators)
+    first = client.request("GET", "orgs/o1/sites")
+    second = client.request("GET", "orgs/o1/sites")
+    assert server.not_modified == validators.not_modified == 1
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert client.get("orgs/o1/sites") == first.json()
+
+def test_writes_forget_stored_validators(server):
+    client = make_client(server, validators=ValidatorStore())
+    client.request("GET", "orgs/o1/sites")
+    client.post({"name": "New"}, "orgs/o1/sites")
+    client.request("GET", "orgs/o1/sites")
+    assert server.not_modified == 0
@@ -0,0 +1,56 @@
+# resumable_paginated picks up after the last completed page
+import pytest
+from conftest import ITEMS
+from mistrs.checkpoint import resumable_paginated, load_job, _journal_files
+
+ALL = list(range(ITEMS))
+
+def crawl(client, path, tmp_path, **kwargs):
+    return resumable_paginated(client, path, "job", limit=100, show_progress=False, journal_dir=tmp_path, **kwargs)
+
+@pytest.mark.parametrize("path", ["sites/s1/stats/devices", "orgs/o1/clients/search",
+                                  "orgs/o1/devices/events/search"])
+def test_resume_from_failed_page(client, server, tmp_path, path):
+    # Page 5 fails every retry, the first run keeps pages 1-4 and the second starts after them
+    server.failures = {5: [503] * 3}
+    first = crawl(client, path, tmp_path)
+    assert [item['id'] for item in first] == list(range(400))
+    state = load_job("job", tmp_path)
+    assert (state['pages'], state['items'], state['complete']) == (4, 400, False)
+
+    server.requests.clear()
+    items = crawl(client, path, tmp_path)
+    assert [item['id'] for item in items] == ALL
+    # Page 4 is fetched again to recover the cursor, pages 1-3 are not
+    assert server.pages() == list(range(4, 12))
+    assert load_job("job", tmp_path) is None
+
+def test_resume_with_workers(client, server, tmp_path):
+    server.failures = {7: [503] * 6}
+    crawl(client, "sites/s1/stats/devices", tmp_path, workers=4)
+    assert load_job("job", tmp_path)['pages'] == 6
+    items = crawl(client, "sites/s1/stats/devices", tmp_path, workers=4)
+    assert [item['id'] for item in items] == ALL
+
+def test_page_written_after_last_state_is_dropped(client, server, tmp_path):
+    # A crash between writing a page and saving the state leaves a page the state doesn't count
+    server.failures = {3: [503] * 3}
+    crawl(client, "sites/s1/stats/devices", tmp_path)
+    _, pages_file = _journal_files("job", tmp_path)
+    with open(pages_file, 'ab') as fh:
+        fh.write(b'[{"id": 200}, {"id": 201}]\n[{"id"')
+    items = crawl(client, "sites/s1/stats/devices", tmp_path)
+    assert [item['id'] for item in items] == ALL
+
+def test_completed_job_with_keep_sends_no_requests(client, server, tmp_path):
+    crawl(client, "sites/s1/stats/devices", tmp_path, keep=True)
+    server.requests.clear()
+    items = crawl(client, "sites/s1/stats/devices", tmp_path, keep=True)
+    assert [item['id'] for item in items] == ALL
+    assert server.pages() == []
+
+def test_resume_with_other_fields_is_refused(client, server, tmp_path):
+    server.failures = {3: [503] * 3}
+    crawl(client, "sites/s1/stats/devices", tmp_path, fields=["id"])
+    with pytest.raises(ValueError):
+        crawl(client, "sites/s1/stats/devices", tmp_path)
@@ -0,0 +1,59 @@
+# Column kinds, widening and flattening of Columnar
+import math
+import pytest
+from mistrs.columnar import Columnar
+
+def test_nested_field_null_on_a_later_page():
+    columnar = Columnar()
+    columnar.extend([{'id': 1, 'ip_stat': {'ip': 'a'}, 'x': 1}])
+    columnar.extend([{'id': 3, 'ip_stat': None, 'x': 2}, {'id': 4, 'x': 3}])
+    assert columnar.columns == ['id', 'ip_stat.ip', 'x']
+    assert columnar.column('ip_stat.ip') == ['a', None, None]
+
+def test_nested_field_null_on_the_first_page():
+    # Same columns in the same order whichever page comes first
+    columnar = Columnar()
+    columnar.extend([{'id': 3, 'ip_stat': None, 'x': 2}])
+    columnar.extend([{'id': 1, 'ip_stat': {'ip': 'a'}, 'x': 1}])
+    assert columnar.columns == ['id', 'ip_stat.ip', 'x']
+    assert columnar.records() == [{'id': 3, 'x': 2}, {'id': 1, 'ip_stat.ip': 'a', 'x': 1}]
+
+def test_int_widens_to_float_then_object():
+    columnar = Columnar([{'n': 1}, {'n': 2}])
+    assert columnar.kinds() == {'n': 'int'}
+    columnar.extend([{'n': 2.5}])
+    assert columnar.kinds() == {'n': 'float'}
+    assert columnar.column('n') == [1, 2, 2.5]
+    columnar.extend([{'n': 'many'}])
+    assert columnar.kinds() == {'n': 'object'}
+    assert columnar.column('n') == [1, 2, 2.5, 'many']
+
+def test_category_widens_to_object():
+    columnar = Columnar([{'model': 'AP45'}, {'model': 'AP43'}, {}])
+    assert columnar.kinds() == {'model': 'category'}
+    columnar.extend([{'model': 45}])
+    assert columnar.kinds() == {'model': 'object'}
+    assert columnar.column('model') == ['AP45', 'AP43', None, 45]
+
+def test_missing_ints_and_bools_are_masked():
+    columnar = Columnar([{'n': 1, 'up': True}, {}, {'n': 0, 'up': False}])
+    assert columnar.kinds() == {'n': 'int', 'up': 'bool'}
+    assert columnar.column('n') == [1, None, 0]
+    assert columnar.column('up') == [True, None, False]
+    assert columnar[1] == {}
+    assert columnar[-1] == {'n': 0, 'up': False}
+
+def test_missing_floats_are_none():
+    columnar = Columnar([{'f': 1.5}, {}])
+    assert columnar.column('f') == [1.5, None]
+    assert math.isnan(columnar._columns['f'].data[1])
+
+def test_to_pandas_dtypes():
+    pytest.importorskip("pandas")
+    columnar = Columnar([{'i': 1, 'mi': 1, 'f': 1.5, 'b': True, 'mb': True, 'model': 'AP45', 'o': [1]},
+                         {'i': 2, 'f': 2.0, 'b': False, 'model': 'AP43', 'o': 'x'}])
+    df = columnar.to_pandas()
+    assert {name: str(dtype) for name, dtype in df.dtypes.items()} == {
+        'i': 'int64', 'mi': 'Int64', 'f': 'float64', 'b': 'bool', 'mb': 'boolean', 'model': 'category', 'o': 'object'}
+    assert df['mi'].isna().tolist() == [False, True]
+    assert list(df['model']) == ['AP45', 'AP43']
@@ -0,0 +1,65 @@
+# stream_to_csv and iter_csv against create_csv and read_csv
+import csv
+import pytest
+from mistrs.data import stream_to_csv, iter_csv, create_csv, read_csv
+
+pd = pytest.importorskip("pandas")
+
+def rows(file):
+    with open(file, newline='', encoding='utf-8') as fh:
+        return list(csv.reader(fh))
+
+def records(count, start=0):
+    return [{'id': i, 'name': f"ap-{i}"} for i in range(start, start + count)]
+
+def test_columns_added_in_later_chunks_widen_earlier_rows(tmp_path):
+    file = tmp_path / "widen.csv"
+    data = records(3) + [{'id': 3, 'name': 'ap-3', 'ip': '10.0.0.3'}] + [{'id': 4, 'extra': 'x,"y"\nz'}]
+    assert stream_to_csv(iter(data), file, chunk_size=2) == 5
+    written = rows(file)
+    assert written[0] == ['id', 'name', 'ip', 'extra']
+    assert {len(row) for row in written} == {4}
+    assert written[1] == ['0', 'ap-0', '', '']
+    assert written[5] == ['4', '', '', 'x,"y"\nz']
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_pages_and_records_give_the_same_file(tmp_path):
+    data = records(250)
+    pages = (data[start:start + 100] for start in range(0, 250, 100))
+    stream_to_csv(pages, tmp_path / "pages.csv", chunk_size=30)
+    stream_to_csv(iter(data), tmp_path / "records.csv", chunk_size=30)
+    assert (tmp_path / "pages.csv").read_bytes() == (tmp_path / "records.csv").read_bytes()
+    assert len(rows(tmp_path / "pages.csv")) == 251
+
+def test_chunks_are_counted_in_records(tmp_path, monkeypatch):
+    sizes = []
+    writerows = csv.DictWriter.writerows
+    monkeypatch.setattr(csv.DictWriter, 'writerows', lambda self, chunk: sizes.append(len(chunk)) or writerows(self, chunk))
+    stream_to_csv((records(400, start) for start in range(0, 1200, 400)), tmp_path / "chunks.csv", chunk_size=500)
+    assert sizes == [800, 400]
+
+def test_columns_fixes_the_header(tmp_path):
+    file = tmp_path / "columns.csv"
+    stream_to_csv(iter([{'id': 1, 'name': 'a', 'skip': 1}]), file, columns=['name', 'id'])
+    assert rows(file) == [['name', 'id'], ['a', '1']]
+
+def test_empty_input(tmp_path):
+    file = tmp_path / "empty.csv"
+    assert stream_to_csv(iter([]), file) == 0
+    assert file.read_text() == ''
+    assert list(iter_csv(file)) == []
+    assert stream_to_csv(iter([]), file, columns=['id', 'name']) == 0
+    assert rows(file) == [['id', 'name']]
+    assert list(iter_csv(file)) == []
+
+def test_iter_csv_reads_what_read_csv_reads(tmp_path):
+    file = tmp_path / "read.csv"
+    stream_to_csv(iter(records(25) + [{'id': 25, 'ip': '10.0.0.1'}]), file, chunk_size=10)
+    assert list(iter_csv(file, chunk_size=7)) == read_csv(str(file))
+    assert [len(df) for df in iter_csv(file, chunk_size=10, frames=True)] == [10, 10, 6]
+
+def test_create_csv_gives_the_same_file_for_a_list_and_a_generator(tmp_path):
+    data = [{'a': 1}, {'b': 2}, {'a': 3}]
+    create_csv(data, tmp_path / "list.csv")
+    create_csv(iter(data), tmp_path / "generator.csv")
+    assert (tmp_path / "list.csv").read_bytes() == (tmp_path / "generator.csv").read_bytes()
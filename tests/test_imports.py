@@ -0,0 +1,15 @@
+# Package level names: star imports and the lazy loading behind them
+import mistrs
+
+BASELINE = ['get_credentials', 'get_headers', 'get', 'get_paginated', 'post', 'put', 'delete', 'debug_get', 'debug_put',
+            'debug_delete', 'debug_post', 'create_xlsx', 'create_csv', 'read_xlsx', 'read_csv', 'list_ids', 'jprint',
+            'print_table', 'clean_mac', 'edittime', 'analyze_errors', 'subnet']
+
+def test_star_import_exports_every_name():
+    namespace = {}
+    exec("from mistrs import *", namespace)
+    assert [name for name in BASELINE if name not in namespace] == []
+    assert [name for name in mistrs._LAZY if name not in namespace] == []
+
+def test_all_names_resolve():
+    assert [name for name in mistrs.__all__ if not hasattr(mistrs, name)] == []
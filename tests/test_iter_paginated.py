@@ -0,0 +1,38 @@
+# iter_pages and iter_paginated only request the pages the caller gets to
+import itertools
+import pytest
+from conftest import ITEMS
+
+PATHS = ["sites/s1/stats/devices", "orgs/o1/clients/search", "orgs/o1/devices/events/search"]
+
+@pytest.mark.parametrize("path", PATHS)
+def test_pages_are_requested_as_they_are_consumed(client, server, path):
+    pages = client.iter_pages(path, limit=100)
+    assert server.pages() == []
+    assert [item['id'] for item in next(pages)] == list(range(100))
+    assert server.pages() == [1]
+    next(pages)
+    assert server.pages() == [1, 2]
+    pages.close()
+
+@pytest.mark.parametrize("path", PATHS)
+def test_stopping_early_stops_requests(client, server, path):
+    items = list(itertools.islice(client.iter_paginated(path, limit=100), 250))
+    assert [item['id'] for item in items] == list(range(250))
+    assert server.pages() == [1, 2, 3]
+
+@pytest.mark.parametrize("path", PATHS[:2])
+def test_stopping_early_with_workers_bounds_requests(client, server, path):
+    # The fan-out requests at most workers * 2 pages ahead and cancels the queued ones on close
+    workers = 2
+    pages = client.iter_pages(path, limit=10, workers=workers)
+    next(pages)
+    next(pages)
+    pages.close()
+    requested = server.pages()
+    assert requested[0] == 1
+    assert len(requested) <= 2 + workers * 2
+    assert ITEMS // 10 > len(requested)
+
+def test_iter_paginated_yields_every_item(client, server):
+    assert [item['id'] for item in client.iter_paginated(PATHS[0], limit=100, workers=4)] == list(range(ITEMS))
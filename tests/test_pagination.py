@@ -0,0 +1,52 @@
+# Order and count of paginated results, serial and with pages fetched concurrently
+import asyncio
+import pytest
+from conftest import ITEMS
+from mistrs.retry import RetryPolicy
+
+ALL = list(range(ITEMS))
+PATHS = ["sites/s1/stats/devices", "orgs/o1/clients/search", "orgs/o1/devices/events/search"]
+
+def ids(items):
+    return [item['id'] for item in items]
+
+@pytest.mark.parametrize("path", PATHS)
+@pytest.mark.parametrize("workers", [None, 4])
+def test_all_items_in_order(client, server, path, workers):
+    items = client.get_paginated(path, limit=100, show_progress=False, workers=workers)
+    assert ids(items) == ALL
+    assert sorted(server.pages()) == list(range(1, 12))
+
+@pytest.mark.parametrize("path", PATHS[:2])
+def test_fan_out_keeps_order_when_pages_finish_out_of_order(client, server, path):
+    # Later pages answer first
+    server.delay = lambda page: (12 - page) * 0.01
+    items = client.get_paginated(path, limit=100, show_progress=False, workers=8)
+    assert ids(items) == ALL
+
+@pytest.mark.parametrize("path", PATHS[:2])
+def test_failed_page_is_handed_to_the_serial_loop(client, server, path):
+    # Page 5 fails every retry in the fan-out, then succeeds when the serial loop asks again
+    server.failures = {5: [503] * 3}
+    items = client.get_paginated(path, limit=100, show_progress=False, workers=4)
+    assert ids(items) == ALL
+    assert server.pages().count(5) == 4
+
+def test_limit_not_dividing_total(client, server):
+    items = client.get_paginated(PATHS[0], limit=400, show_progress=False, workers=4)
+    assert ids(items) == ALL
+    assert sorted(server.pages()) == [1, 2, 3]
+
+@pytest.mark.parametrize("path", PATHS[:2])
+def test_async_failed_page_is_fetched_again(server, path):
+    pytest.importorskip("aiohttp")
+    from mistrs import aio
+    server.failures = {5: [503] * 3}
+
+    async def run():
+        async with aio.AsyncMistClient({'api_url': server.url, 'api_token': 'test-token'}, rate_limit=False,
+                                       retry=RetryPolicy(max_attempts=3, backoff=0, jitter=False)) as client:
+            return await client.get_paginated(path, limit=100, show_progress=False)
+
+    assert ids(asyncio.run(run())) == ALL
+    assert server.pages().count(5) == 4
@@ -0,0 +1,64 @@
+# Retry counts of MistClient and AsyncMistClient, and pages that still fail after the retries
+import asyncio
+import pytest
+from mistrs.retry import RetryPolicy
+
+PAGE = "sites/s1/stats/devices?limit=100&page=2"
+
+def test_transient_errors_are_retried(client, server):
+    server.failures = {2: [503, 502]}
+    response = client.request("GET", PAGE)
+    assert response.status_code == 200
+    assert response.attempts == 3
+    assert server.pages() == [2, 2, 2]
+
+def test_attempts_stop_at_max_attempts(client, server):
+    server.failures = {2: [503] * 5}
+    response = client.request("GET", PAGE)
+    assert response.status_code == 503
+    assert response.attempts == 3
+    assert len(server.pages()) == 3
+
+def test_client_errors_are_not_retried(client, server):
+    server.failures = {2: [404]}
+    assert client.request("GET", PAGE).status_code == 404
+    assert len(server.pages()) == 1
+
+def test_retry_false_sends_once(client, server):
+    server.failures = {2: [503]}
+    assert client.request("GET", PAGE, retry=False).status_code == 503
+    assert len(server.pages()) == 1
+
+def test_post_is_only_retried_on_429(client, server):
+    server.failures = {1: [503]}
+    assert client.request("POST", "orgs/o1/sites", json={}).status_code == 503
+    assert len(server.pages()) == 1
+    server.failures = {1: [429, 429]}
+    assert client.request("POST", "orgs/o1/sites", json={}).status_code == 200
+    assert len(server.pages()) == 4
+    server.failures = {1: [503]}
+    assert client.request("POST", "orgs/o1/sites", json={}, retry=RetryPolicy(backoff=0, retry_post=True)).status_code == 200
+
+@pytest.mark.parametrize("path", ["sites/s1/stats/devices", "orgs/o1/devices/events/search"])
+def test_page_failing_after_retries_warns(client, server, capsys, path):
+    server.failures = {4: [429] * 3}
+    items = client.get_paginated(path, limit=100, show_progress=False)
+    assert [item['id'] for item in items] == list(range(300))
+    assert server.pages().count(4) == 3
+    assert "Warning: pagination stopped early" in capsys.readouterr().out
+
+def test_async_page_failing_after_retries_warns(server, capsys):
+    pytest.importorskip("aiohttp")
+    from mistrs import aio
+    # Fails the concurrent fetch and the retry on its own
+    server.failures = {4: [503] * 6}
+
+    async def run():
+        async with aio.AsyncMistClient({'api_url': server.url, 'api_token': 'test-token'}, rate_limit=False,
+                                       retry=RetryPolicy(max_attempts=3, backoff=0, jitter=False)) as client:
+            return await client.get_paginated("sites/s1/stats/devices", limit=100, show_progress=False)
+
+    items = asyncio.run(run())
+    assert len(items) < 1050
+    assert server.pages().count(4) == 6
+    assert "Warning: pagination stopped early" in capsys.readouterr().out
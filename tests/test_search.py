@@ -0,0 +1,45 @@
+# search_events splits a long window into shards and halves the ones that hit the result cap
+import pytest
+from mistrs.search import search_events
+
+URL = "orgs/o1/devices/events/search?type=AP_DISCONNECTED"
+
+def search(client, **kwargs):
+    return search_events(client, URL, show_progress=False, **kwargs)
+
+def events(timestamps):
+    return [{"id": i, "timestamp": timestamp} for i, timestamp in enumerate(timestamps)]
+
+def test_events_come_back_once_in_timestamp_order(client, server):
+    server.events = events(range(0, 1000, 2))
+    result = search(client, start=0, end=1000, shards=4, limit=50)
+    assert [event['timestamp'] for event in result] == list(range(0, 1000, 2))
+    assert sorted(server.windows) == [(0, 250), (250, 500), (500, 750), (750, 1000)]
+
+def test_events_on_window_edges_are_not_duplicated(client, server):
+    # start and end are inclusive, so an event on an edge is returned by both windows
+    server.events = events([0, 250, 250, 500, 750, 1000])
+    result = search(client, start=0, end=1000, shards=4)
+    assert [event['id'] for event in result] == [0, 1, 2, 3, 4, 5]
+
+def test_key_decides_what_is_a_duplicate(client, server):
+    server.events = [{"id": 1, "timestamp": 10, "seen": "a"}, {"id": 1, "timestamp": 10, "seen": "b"}]
+    assert len(search(client, start=0, end=100, shards=1)) == 2
+    assert len(search(client, start=0, end=100, shards=1, key=lambda event: event['id'])) == 1
+
+def test_capped_window_is_split_until_it_fits(client, server):
+    server.events = events(range(0, 4000))
+    server.search_cap = 1000
+    result = search(client, start=0, end=4000, shards=1, limit=500, max_results=1000)
+    assert [event['timestamp'] for event in result] == list(range(4000))
+    # 4000 -> 2000 -> 1000 -> 500 second windows, the last ones hold fewer than 1000 events
+    assert (0, 4000) in server.windows and (0, 2000) in server.windows
+    assert min(end - start for start, end in server.windows) == 500
+
+def test_windows_stop_splitting_at_min_window(client, server, capsys):
+    server.events = events([100 + i % 10 for i in range(2000)])
+    server.search_cap = 1000
+    result = search(client, start=0, end=1000, shards=1, limit=500, max_results=1000, min_window=100)
+    assert min(end - start for start, end in server.windows) >= 50
+    assert len(result) == 1000
+    assert "still reports" in capsys.readouterr().out
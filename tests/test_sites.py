@@ -0,0 +1,37 @@
+# get_sites keeps the site directory in a file and only downloads it again when it changed
+import json, time
+from mistrs.adv import get_sites, SITES_PAGE
+
+def sites(count):
+    return [{"id": f"site-{i}", "name": f"Site {i}", "timezone": "UTC", "sitegroup_ids": []} for i in range(count)]
+
+def test_saved_directory_is_used_within_max_age(client, server, tmp_path):
+    assert len(get_sites(client, "o1", config_dir=tmp_path)) == 5
+    server.requests.clear()
+    assert get_sites(client, "o1", config_dir=tmp_path).name("site-3") == "Site 3"
+    assert server.requests == []
+
+def test_unchanged_directory_is_answered_with_304(client, server, tmp_path):
+    get_sites(client, "o1", config_dir=tmp_path)
+    get_sites(client, "o1", config_dir=tmp_path, refresh=True)
+    assert server.not_modified == 1
+    server.sites[2]["name"] = "Renamed"
+    assert get_sites(client, "o1", config_dir=tmp_path, refresh=True).name("site-2") == "Renamed"
+    assert server.not_modified == 1
+
+def test_change_after_the_first_page_is_picked_up(client, server, tmp_path):
+    server.sites = sites(SITES_PAGE + 200)
+    assert len(get_sites(client, "o1", config_dir=tmp_path)) == SITES_PAGE + 200
+    server.sites[SITES_PAGE + 100]["name"] = "Renamed"
+    server.sites.append({"id": "new", "name": "New", "timezone": "UTC", "sitegroup_ids": []})
+    directory = get_sites(client, "o1", config_dir=tmp_path, refresh=True)
+    assert directory.name(f"site-{SITES_PAGE + 100}") == "Renamed"
+    assert directory.id("New") == "new"
+    assert server.not_modified == 0
+
+def test_saved_file_without_checked_is_downloaded_again(client, server, tmp_path):
+    file = tmp_path / "sites" / "o1.json"
+    file.parent.mkdir()
+    file.write_text(json.dumps({"org_id": "o1", "sites": []}))
+    assert len(get_sites(client, "o1", config_dir=tmp_path)) == 5
+    assert json.loads(file.read_text())["checked"] <= time.time()